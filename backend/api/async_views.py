@@ -0,0 +1,171 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, status
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAuthenticated, NotFound)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from recipes.models import Ingredient, Recipe, Tag
+
+from . import conditional, views
+from .readers import read_queryset
+from .serializers import (TaskSerializer, get_projection,
+                          read_serializer_class)
+
+TAG_FIELDS = ('id', 'name', 'slug', 'color')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    return HttpResponse(renderer.render(data), status=status_code,
+                        content_type=renderer.media_type)
+
+
+def error_response(request, exc):
+    """Ответ на исключение DRF в формате ``APIView.handle_exception``."""
+    detail = exc.detail
+    if not isinstance(detail, (list, dict)):
+        detail = {'detail': detail}
+    response = render(detail, exc.status_code)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        header = None
+        if request.authenticators:
+            header = request.authenticators[0].authenticate_header(request)
+        if header:
+            response['WWW-Authenticate'] = header
+        else:
+            response.status_code = status.HTTP_403_FORBIDDEN
+    return response
+
+
+def async_read_view(fallback):
+    """Асинхронный обработчик GET для ASGI-режима.
+
+    Остальные методы передаются синхронному DRF-представлению
+    ``fallback``, поэтому маршрут полностью заменяет роутерный.
+    Аутентификация - классы представления ``fallback``, как в WSGI.
+    """
+    authentication_classes = fallback.cls.authentication_classes
+
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_to_async(fallback)(
+                    request, *args, **kwargs)
+            request = Request(request, authenticators=[
+                authentication() for authentication
+                in authentication_classes])
+            try:
+                await sync_to_async(lambda: request.user)()
+                return await handler(request, *args, **kwargs)
+            except APIException as exc:
+                return error_response(request, exc)
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+async def get_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise NotFound('No {} matches the given query.'.format(
+            queryset.model._meta.object_name))
+
+
+def recipe_queryset(request):
+    queryset = read_queryset(Recipe.objects.all(),
+                             get_projection(request.query_params))
+    return DjangoFilterBackend().filter_queryset(
+        request, queryset, views.RecipeViewSet)
+
+
+def serialize_recipes(recipes, request, many=False):
+    return read_serializer_class()(recipes, many=many, context={
+        'request': request,
+        'projection': get_projection(request.query_params),
+    }).data
+
+
+def paginate_recipes(queryset, request):
+    """Страница рецептов пагинатором RecipeViewSet, как в WSGI."""
+    paginator = views.RecipeViewSet.pagination_class()
+    recipes = paginator.paginate_queryset(queryset, request)
+    return paginator.get_paginated_response(
+        serialize_recipes(recipes, request, many=True)).data
+
+
+@async_read_view(views.TagViewSet.as_view({'get': 'list'}))
+async def tag_list(request):
+    return render([tag async for tag in Tag.objects.values(*TAG_FIELDS)])
+
+
+@async_read_view(views.TagViewSet.as_view({'get': 'retrieve'}))
+async def tag_detail(request, pk):
+    return render(await get_or_404(Tag.objects.values(*TAG_FIELDS), pk=pk))
+
+
+@async_read_view(views.IngredientViewSet.as_view({'get': 'list'}))
+async def ingredient_list(request):
+    queryset = filters.SearchFilter().filter_queryset(
+        request, Ingredient.objects.values(*INGREDIENT_FIELDS),
+        views.IngredientViewSet)
+    return render([ingredient async for ingredient in queryset])
+
+
+@async_read_view(views.IngredientViewSet.as_view({'get': 'retrieve'}))
+async def ingredient_detail(request, pk):
+    return render(await get_or_404(
+        Ingredient.objects.values(*INGREDIENT_FIELDS), pk=pk))
+
+
+@async_read_view(views.RecipeViewSet.as_view({'get': 'list',
+                                              'post': 'create'}))
+async def recipe_list(request):
+    queryset = await sync_to_async(recipe_queryset)(request)
+    etag, _ = await sync_to_async(conditional.list_validators)(
+        queryset, request)
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return response
+    return conditional.set_validators(render(
+        await sync_to_async(paginate_recipes)(queryset, request)), etag)
+
+
+@async_read_view(views.RecipeViewSet.as_view({'get': 'retrieve',
+                                              'put': 'update',
+                                              'patch': 'partial_update',
+                                              'delete': 'destroy'}))
+async def recipe_detail(request, pk):
+    queryset = await sync_to_async(recipe_queryset)(request)
+    etag, last_modified = await sync_to_async(
+        conditional.detail_validators)(queryset, pk, request)
+    response = conditional.not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    recipe = await get_or_404(queryset, pk=pk)
+    return conditional.set_validators(
+        render(await sync_to_async(serialize_recipes)(recipe, request)),
+        etag, last_modified)
+
+
+@async_read_view(views.RecipeViewSet.as_view(
+    {'get': 'download_shopping_cart', 'post': 'download_shopping_cart'}))
+async def download_shopping_cart(request):
+    if not request.user.is_authenticated:
+        raise NotAuthenticated
+    response, queued = await sync_to_async(views.shopping_list_file)(
+        request.user)
+    if queued is None:
+        return response
+    data = await sync_to_async(lambda: TaskSerializer(
+        queued, context={'request': request}).data)()
+    response = render(data, status.HTTP_202_ACCEPTED)
+    response['Location'] = data['url']
+    return response
@@ -0,0 +1,269 @@
+import hashlib
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+NAMESPACES = {}
+STATS = ('l1_hits', 'l2_hits', 'misses', 'stale', 'sets', 'evictions')
+
+
+def l2():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+class LRU:
+    """Ограниченный словарь с вытеснением давно не читанных записей."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[-1] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        """Сохраняет запись, возвращает число вытесненных."""
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TagVersions:
+    """Версии тегов инвалидации в L2 с локальной копией.
+
+    Другие процессы видят инвалидацию не позже, чем через
+    ``API_CACHE_TAG_CHECK_INTERVAL`` секунд, этот процесс - сразу.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, tags):
+        now = time.monotonic()
+        versions = {}
+        stale = []
+        with self._lock:
+            for tag in tags:
+                known = self._versions.get(tag)
+                if known is None or known[1] < now:
+                    stale.append(tag)
+                else:
+                    versions[tag] = known[0]
+        if stale:
+            keys = {f'tag:{tag}': tag for tag in stale}
+            found = l2().get_many(keys)
+            missing = {key: time.time_ns() for key in keys if key not in found}
+            for key, version in missing.items():
+                if not l2().add(key, version, None):
+                    missing[key] = l2().get(key, version)
+            found.update(missing)
+            expires_at = now + settings.API_CACHE_TAG_CHECK_INTERVAL
+            with self._lock:
+                for key, tag in keys.items():
+                    versions[tag] = found[key]
+                    self._versions[tag] = (found[key], expires_at)
+        return versions
+
+    def bump(self, tags):
+        version = time.time_ns()
+        l2().set_many({f'tag:{tag}': version for tag in tags}, None)
+        expires_at = time.monotonic() + settings.API_CACHE_TAG_CHECK_INTERVAL
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = (version, expires_at)
+
+
+tag_versions = TagVersions()
+
+
+def invalidate_tags(*tags):
+    """Делает устаревшими записи всех пространств с этими тегами."""
+    tag_versions.bump(tags)
+
+
+class TieredCache:
+    """Двухуровневый кэш пространства имён.
+
+    L1 - LRU в памяти процесса на ``API_CACHE_L1_SIZE`` записей со
+    сроком ``API_CACHE_L1_TIMEOUT``, L2 - общий кэш
+    ``API_CACHE_ALIAS``. Запись хранит версии своих тегов и считается
+    промахом, если хоть один тег с тех пор инвалидирован. Пространство
+    целиком сбрасывается тегом с его именем. Счётчики попаданий
+    периодически добавляются в L2, их показывает ``cache_stats``.
+    """
+
+    def __init__(self, namespace, timeout=None, l1_size=None):
+        self.namespace = namespace
+        self.timeout = timeout or settings.API_CACHE_TIMEOUT
+        self.l1 = LRU(l1_size or settings.API_CACHE_L1_SIZE)
+        self.stats = Counter()
+        self._flushed_at = time.monotonic()
+        self._stats_lock = threading.Lock()
+        NAMESPACES[namespace] = self
+
+    def make_key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def count(self, **counts):
+        with self._stats_lock:
+            self.stats.update(counts)
+            if (time.monotonic() - self._flushed_at
+                    < settings.API_CACHE_STATS_INTERVAL):
+                return
+            counts, self.stats = self.stats, Counter()
+            self._flushed_at = time.monotonic()
+        self.flush_stats(counts)
+
+    def flush_stats(self, counts=None):
+        if counts is None:
+            with self._stats_lock:
+                counts, self.stats = self.stats, Counter()
+        for name, value in counts.items():
+            if value:
+                key = f'stats:{self.namespace}:{name}'
+                l2().add(key, 0, None)
+                try:
+                    l2().incr(key, value)
+                except ValueError:
+                    l2().set(key, value, None)
+
+    def read_stats(self):
+        found = l2().get_many(
+            [f'stats:{self.namespace}:{name}' for name in STATS])
+        return {name: found.get(f'stats:{self.namespace}:{name}', 0)
+                for name in STATS}
+
+    def reset_stats(self):
+        l2().delete_many(
+            [f'stats:{self.namespace}:{name}' for name in STATS])
+
+    def _fresh(self, versions):
+        current = tag_versions.get(versions)
+        return all(current[tag] == version
+                   for tag, version in versions.items())
+
+    def get_many(self, keys):
+        result = {}
+        l2_keys = {}
+        l1_hits = stale = 0
+        for key in keys:
+            entry = self.l1.get(self.make_key(key))
+            if entry is not None and self._fresh(entry[1]):
+                result[key] = entry[0]
+                l1_hits += 1
+            else:
+                l2_keys[self.make_key(key)] = key
+        l1_evictions = 0
+        if l2_keys:
+            found = l2().get_many(l2_keys)
+            expires_at = time.monotonic() + settings.API_CACHE_L1_TIMEOUT
+            for full_key, (value, versions) in found.items():
+                if not self._fresh(versions):
+                    stale += 1
+                    continue
+                result[l2_keys[full_key]] = value
+                l1_evictions += self.l1.set(
+                    full_key, (value, versions, expires_at))
+        self.count(l1_hits=l1_hits, l2_hits=len(result) - l1_hits,
+                   misses=len(keys) - len(result), stale=stale,
+                   evictions=l1_evictions)
+        return result
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def versions(self, tags=()):
+        """Текущие версии тегов записи.
+
+        Их читают до вычисления значения и передают в ``set_many``:
+        иначе инвалидация во время вычисления потеряется.
+        """
+        return tag_versions.get((self.namespace, *tags))
+
+    def set_many(self, mapping, tags=(), timeout=None, versions=None):
+        if versions is None:
+            versions = self.versions(tags)
+        expires_at = time.monotonic() + settings.API_CACHE_L1_TIMEOUT
+        evictions = 0
+        entries = {}
+        for key, value in mapping.items():
+            full_key = self.make_key(key)
+            entries[full_key] = (value, versions)
+            evictions += self.l1.set(full_key, (value, versions, expires_at))
+        l2().set_many(entries, timeout or self.timeout)
+        self.count(sets=len(entries), evictions=evictions)
+
+    def set(self, key, value, tags=(), timeout=None, versions=None):
+        self.set_many({key: value}, tags, timeout, versions)
+
+    def get_or_set(self, key, default, tags=(), timeout=None):
+        value = self.get(key, self)
+        if value is self:
+            versions = self.versions(tags)
+            value = default() if callable(default) else default
+            self.set(key, value, tags, timeout, versions)
+        return value
+
+    def delete_many(self, keys):
+        full_keys = [self.make_key(key) for key in keys]
+        for full_key in full_keys:
+            self.l1.delete(full_key)
+        l2().delete_many(full_keys)
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def clear(self):
+        self.l1.clear()
+        invalidate_tags(self.namespace)
+
+
+lists = TieredCache('lists')
+fragments = TieredCache('fragments')
+
+
+class CachedListMixin:
+    """Ответ list из пространства ``lists`` по параметрам запроса.
+
+    Годится для списков без пользовательских полей. Записи помечаются
+    тегом ``cache_tag`` и сбрасываются его инвалидацией.
+    """
+
+    cache_tag = None
+
+    def list(self, request, *args, **kwargs):
+        key = '{}:{}'.format(self.cache_tag, hashlib.md5(repr(
+            sorted(request.query_params.lists())).encode()).hexdigest())
+        data = lists.get(key)
+        if data is None:
+            versions = lists.versions((self.cache_tag, ))
+            data = super().list(request, *args, **kwargs).data
+            lists.set(key, data, versions=versions)
+        return Response(data)
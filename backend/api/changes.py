@@ -0,0 +1,123 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from recipes.models import Change, Favorite, Shopping_cart, Version
+from users.models import Subscribe
+
+RELATION_KINDS = {
+    Favorite: (Change.FAVORITE, 'recipe_id'),
+    Shopping_cart: (Change.SHOPPING_CART, 'recipe_id'),
+    Subscribe: (Change.SUBSCRIPTION, 'author_id'),
+}
+
+# Ключ advisory-блокировки PostgreSQL, под которой пишется журнал.
+LOCK_ID = 7150044
+HORIZON_KEY = 'changes:horizon'
+
+_local = threading.local()
+
+
+def lock():
+    """Отмечает транзакцию как пишущую журнал до её конца.
+
+    Блокировка разделяемая: пишущие транзакции друг друга не ждут.
+    Её видит ``horizon()``.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock_shared(%s)',
+                           [LOCK_ID])
+
+
+def horizon():
+    """Наибольший id журнала, до которого все записи закоммичены.
+
+    id выдаются последовательностью при вставке, а не при коммите:
+    транзакция с меньшим id может закоммититься после большего, и
+    клиент, получивший токен больше её id, потерял бы изменение.
+    Поэтому синхронизация отдаёт записи не дальше горизонта. В
+    PostgreSQL он считается, только если удалось без ожидания взять
+    исключительную блокировку журнала, то есть пишущих транзакций
+    нет; иначе берётся последний сохранённый горизонт. В SQLite
+    пишущие транзакции идут по одной, и горизонт - просто max(id).
+    """
+    if connection.vendor != 'postgresql':
+        return Change.objects.aggregate(last=Max('id'))['last'] or 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_xact_lock(%s)',
+                           [LOCK_ID])
+            locked = cursor.fetchone()[0]
+        if locked:
+            last = Change.objects.aggregate(last=Max('id'))['last'] or 0
+            if not Version.objects.filter(
+                    name=HORIZON_KEY, value__gte=last).exists():
+                Version.objects.update_or_create(
+                    name=HORIZON_KEY, defaults={'value': last})
+            return last
+    return (Version.objects.filter(name=HORIZON_KEY)
+            .values_list('value', flat=True).first() or 0)
+
+
+def write(changes):
+    """Пишет изменения ``{(kind, object_id, user_id): deleted}``.
+
+    Прежние записи о тех же объектах удаляются, новые получают
+    id больше всех выданных ранее.
+    """
+    if not changes:
+        return
+    groups = defaultdict(list)
+    for kind, object_id, user_id in changes:
+        groups[kind, user_id].append(object_id)
+    with transaction.atomic():
+        lock()
+        for (kind, user_id), object_ids in groups.items():
+            Change.objects.filter(kind=kind, user_id=user_id,
+                                  object_id__in=object_ids).delete()
+        Change.objects.bulk_create(
+            Change(kind=kind, object_id=object_id, user_id=user_id,
+                   deleted=deleted)
+            for (kind, object_id, user_id), deleted in changes.items()
+        )
+
+
+def log_change(kind, object_id, user_id=None, deleted=False):
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        write({(kind, object_id, user_id): deleted})
+    else:
+        pending[kind, object_id, user_id] = deleted
+
+
+def log_relations(model, user_id, object_ids, deleted=False):
+    kind, _ = RELATION_KINDS[model]
+    for object_id in object_ids:
+        log_change(kind, object_id, user_id, deleted)
+
+
+def log_relation(instance, deleted=False):
+    kind, field = RELATION_KINDS[type(instance)]
+    log_change(kind, getattr(instance, field), instance.user_id, deleted)
+
+
+@contextmanager
+def collect():
+    """Копит записи журнала внутри блока и пишет их одной пачкой.
+
+    Блок выполняется в транзакции: журнал меняется вместе с данными.
+    """
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+    _local.pending = {}
+    try:
+        with transaction.atomic():
+            yield
+            write(_local.pending)
+    finally:
+        _local.pending = None
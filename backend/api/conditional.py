@@ -0,0 +1,111 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.settings import api_settings
+
+from recipes.models import Favorite, Shopping_cart
+from users.models import Subscribe
+
+from .registry import registry
+
+
+def make_etag(request, *parts):
+    """ETag из ``parts`` и общих для всех ответов частей.
+
+    Учитываются формат рендерера и версия реестра тегов и
+    ингредиентов: их названия и единицы измерения входят в ответ.
+    Данные автора входят в ``updated_at`` рецепта, его поднимает
+    изменение профиля.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    if renderer is None:
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]
+    parts += (renderer.format, registry.version, user_state(request.user))
+    return '"{}"'.format(hashlib.md5(repr(parts).encode()).hexdigest())
+
+
+def user_state(user):
+    """Отпечаток избранного, корзины и подписок пользователя.
+
+    Меняется при любом добавлении (растёт max id) и удалении (падает
+    количество), поэтому учитывает флаги ``is_favorited``,
+    ``is_in_shopping_cart`` и ``is_subscribed`` в ответе.
+    """
+    if not user.is_authenticated:
+        return None
+    return tuple(
+        tuple(model.objects.filter(user=user).aggregate(
+            count=Count('id'), last=Max('id')).values())
+        for model in (Favorite, Shopping_cart, Subscribe)
+    )
+
+
+def list_validators(queryset, request):
+    state = queryset.order_by().aggregate(
+        count=Count('id'), last=Max('updated_at'))
+    return make_etag(request, state['count'], state['last']), None
+
+
+def detail_validators(queryset, pk, request):
+    try:
+        row = (queryset.filter(pk=pk).order_by()
+               .values_list('pk', 'updated_at').first())
+    except (TypeError, ValueError):
+        return None, None
+    if row is None:
+        return None, None
+    pk, updated_at = row
+    last_modified = None
+    if not request.user.is_authenticated:
+        # Версия реестра - время его последнего изменения в нс.
+        last_modified = int(max(updated_at.timestamp(),
+                                registry.version / 10 ** 9))
+    return make_etag(request, pk, updated_at), last_modified
+
+
+def not_modified(request, etag, last_modified=None):
+    if etag is None or request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified=None):
+    if etag is None:
+        return response
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Accept', 'Authorization'))
+    return response
+
+
+class ConditionalGetMixin:
+    """Ответ 304 для списка и детальной страницы без сериализации.
+
+    Посчитанный ETag сохраняется в ``self.etag`` для следующих миксинов.
+    """
+
+    etag = None
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = list_validators(
+            self.filter_queryset(self.get_queryset()), request)
+        self.etag = etag
+        return (not_modified(request, etag, last_modified)
+                or set_validators(super().list(request, *args, **kwargs),
+                                  etag, last_modified))
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = detail_validators(
+            self.filter_queryset(self.get_queryset()),
+            kwargs[self.lookup_url_kwarg or self.lookup_field], request)
+        self.etag = etag
+        return (not_modified(request, etag, last_modified)
+                or set_validators(super().retrieve(request, *args, **kwargs),
+                                  etag, last_modified))
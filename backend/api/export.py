@@ -0,0 +1,43 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from recipes.models import Recipe
+
+from .readers import RECIPE_FIELDS, RECIPE_RELATIONS, Projection, build_recipes
+
+EXPORT = Projection(
+    fields=[field for field in RECIPE_FIELDS
+            if not field.startswith('is_')],
+    expand=RECIPE_RELATIONS,
+    flags=False,
+)
+
+
+def export_recipes(after=0, chunk_size=None, request=None):
+    """Рецепты с id больше ``after`` по возрастанию id, пачками.
+
+    Строки читаются курсором на сервере БД, связи загружаются на
+    пачку целиком, поэтому память не растёт с размером каталога.
+    Выгрузку можно продолжить с последнего полученного id.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = (Recipe.objects.filter(id__gt=after).order_by('id')
+            .values('id').iterator(chunk_size=chunk_size))
+    for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+        yield build_recipes(chunk, request, EXPORT)
+
+
+async def aiterate(iterator):
+    """Отдаёт синхронный итератор в ASGI по одному элементу.
+
+    Django потребляет синхронный итератор StreamingHttpResponse под
+    ASGI целиком, здесь же каждая пачка читается в потоке БД.
+    """
+    sentinel = object()
+    while True:
+        item = await sync_to_async(next)(iterator, sentinel)
+        if item is sentinel:
+            return
+        yield item
@@ -0,0 +1,249 @@
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import Change, IngredientInRecipe, Recipe
+from recipes.tasks import compute_similar
+from tasks.queue import enqueue_on_commit
+from users.models import User
+
+from .changes import collect, log_change
+from .ingredient_index import ingredient_index
+from .registry import registry
+from .serializers import RecipeImportSerializer
+
+
+def read_ndjson(file):
+    for line, text in enumerate(file, 1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError as exc:
+            yield line, ValidationError(
+                {'line': [f'Некорректный JSON: {exc}']})
+
+
+def read_csv(file):
+    """Строки CSV в виде рецептов NDJSON.
+
+    Теги - слаги через запятую, ингредиенты - записи
+    ``название, единица: количество`` через точку с запятой.
+    """
+    reader = csv.DictReader(file)
+    for row in reader:
+        ingredients = []
+        for entry in (row.get('ingredients') or '').split(';'):
+            if not entry.strip():
+                continue
+            name, _, amount = entry.rpartition(':')
+            name, _, unit = name.rpartition(',') if ',' in name else (
+                name, '', '')
+            ingredient = {'name': name, 'amount': amount.strip()}
+            if unit.strip():
+                ingredient['measurement_unit'] = unit
+            ingredients.append(ingredient)
+        row['tags'] = [slug for slug in (row.get('tags') or '').split(',')
+                       if slug.strip()]
+        row['ingredients'] = ingredients
+        if not row.get('author'):
+            row.pop('author', None)
+        yield reader.line_num, row
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def normalize(row):
+    """Принимает и строки выгрузки export: теги и автор - объекты."""
+    if isinstance(row.get('author'), dict):
+        row['author'] = row['author'].get('username')
+    if isinstance(row.get('tags'), list):
+        row['tags'] = [tag.get('slug') if isinstance(tag, dict) else tag
+                       for tag in row['tags']]
+    return row
+
+
+class Importer:
+    """Загрузка рецептов пачками.
+
+    Теги и ингредиенты ищутся по словарям из реестра, авторы - одним
+    запросом на пачку. Картинки декодируются и сохраняются пулом
+    потоков, рецепты, ингредиенты и теги пачки пишутся bulk_create в
+    одной транзакции. Ошибки собираются по номерам строк.
+    """
+
+    def __init__(self, default_author=None, chunk_size=None, threads=None):
+        self.default_author = default_author
+        self.chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+        self.threads = threads or settings.IMPORT_THREADS
+        self.tags = {}
+        for tag in registry.tags():
+            self.tags[tag.name] = tag.id
+            self.tags[tag.slug] = tag.id
+        self.ingredients = {}
+        self.ingredient_names = {}
+        for ingredient in registry.ingredients():
+            name = ingredient.name.lower()
+            self.ingredients[name, ingredient.measurement_unit] = (
+                ingredient.id)
+            # Без единицы измерения название должно быть однозначным.
+            self.ingredient_names[name] = (
+                None if name in self.ingredient_names else ingredient.id)
+        self.created = 0
+        self.errors = []
+
+    def fail(self, line, errors):
+        self.errors.append({'line': line, 'errors': errors})
+
+    def run(self, rows):
+        rows = iter(rows)
+        with ThreadPoolExecutor(self.threads,
+                                thread_name_prefix='import') as executor:
+            self.executor = executor
+            for chunk in iter(lambda: list(islice(rows, self.chunk_size)),
+                              []):
+                self.import_chunk(chunk)
+        if self.created:
+            transaction.on_commit(ingredient_index.invalidate)
+            enqueue_on_commit(compute_similar, compute_similar.task_name)
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
+
+    def validate(self, line, row):
+        if isinstance(row, ValidationError):
+            self.fail(line, row.detail)
+            return None
+        if not isinstance(row, dict):
+            self.fail(line, {'line': ['Ожидается объект.']})
+            return None
+        serializer = RecipeImportSerializer(data=normalize(row))
+        if not serializer.is_valid():
+            self.fail(line, serializer.errors)
+            return None
+        data = serializer.validated_data
+        errors = {}
+        tag_ids = []
+        for tag in data['tags']:
+            if tag not in self.tags:
+                errors.setdefault('tags', []).append(
+                    f'Неизвестный тег: {tag}.')
+            tag_ids.append(self.tags.get(tag))
+        if len(set(tag_ids)) != len(tag_ids):
+            errors.setdefault('tags', []).append(
+                'Теги должны быть уникальны.')
+        amounts = {}
+        for ingredient in data['ingredients']:
+            name = ingredient['name'].strip().lower()
+            unit = ingredient.get('measurement_unit', '').strip()
+            ingredient_id = (self.ingredients.get((name, unit)) if unit
+                             else self.ingredient_names.get(name))
+            if ingredient_id is None:
+                errors.setdefault('ingredients', []).append(
+                    f'Неизвестный ингредиент: {name}'
+                    + (f' ({unit})' if unit else '') + '.')
+            elif ingredient_id in amounts:
+                errors.setdefault('ingredients', []).append(
+                    'Ингредиенты должны быть уникальны.')
+            amounts[ingredient_id] = ingredient['amount']
+        if errors:
+            self.fail(line, errors)
+            return None
+        data['tags'] = tag_ids
+        data['ingredients'] = amounts
+        return data
+
+    @staticmethod
+    def store_image(value):
+        """Имя файла в хранилище: готовое из выгрузки или новое."""
+        path = urlparse(value).path
+        if path.startswith(settings.MEDIA_URL):
+            name = path[len(settings.MEDIA_URL):]
+            if default_storage.exists(name):
+                return name, False
+        image = Base64ImageField().run_validation(value)
+        field = Recipe._meta.get_field('image')
+        return default_storage.save(
+            field.generate_filename(None, image.name), image), True
+
+    def try_store_image(self, value):
+        try:
+            return self.store_image(value)
+        except ValidationError as exc:
+            return exc, False
+        except DjangoValidationError as exc:
+            return ValidationError(exc.messages), False
+        except SuspiciousFileOperation:
+            return ValidationError(['Некорректный путь к картинке.']), False
+
+    def import_chunk(self, chunk):
+        valid = []
+        for line, row in chunk:
+            data = self.validate(line, row)
+            if data is not None:
+                valid.append((line, data))
+        usernames = {data['author'] for _, data in valid if 'author' in data}
+        authors = dict(User.objects.filter(username__in=usernames)
+                       .values_list('username', 'id'))
+        images = self.executor.map(self.try_store_image,
+                                   [data['image'] for _, data in valid])
+        prepared = []
+        for (line, data), (image, new) in zip(valid, images):
+            if isinstance(image, ValidationError):
+                self.fail(line, {'image': image.detail})
+                continue
+            author_id = authors.get(data.get('author'))
+            if author_id is None and 'author' not in data:
+                author_id = getattr(self.default_author, 'pk', None)
+            if author_id is None:
+                self.fail(line, {'author': [
+                    f'Неизвестный автор: {data.get("author", "")}.']})
+                if new:
+                    default_storage.delete(image)
+                continue
+            prepared.append((line, data, new, Recipe(
+                author_id=author_id, name=data['name'], text=data['text'],
+                cooking_time=data['cooking_time'], image=image)))
+        if not prepared:
+            return
+        try:
+            with collect():
+                recipes = Recipe.objects.bulk_create(
+                    recipe for _, _, _, recipe in prepared)
+                IngredientInRecipe.objects.bulk_create(
+                    IngredientInRecipe(recipe_id=recipe.pk,
+                                       ingredient_id=ingredient_id,
+                                       amount=amount)
+                    for (_, data, _, _), recipe in zip(prepared, recipes)
+                    for ingredient_id, amount in data['ingredients'].items()
+                )
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                    for (_, data, _, _), recipe in zip(prepared, recipes)
+                    for tag_id in data['tags']
+                )
+                for recipe in recipes:
+                    log_change(Change.RECIPE, recipe.pk)
+        except DatabaseError as exc:
+            for line, _, new, recipe in prepared:
+                if new:
+                    default_storage.delete(recipe.image.name)
+                self.fail(line, {'line': [f'Ошибка записи пачки: {exc}']})
+            return
+        self.created += len(recipes)
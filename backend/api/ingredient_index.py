@@ -0,0 +1,196 @@
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from recipes.models import IngredientInRecipe
+
+from . import versions
+
+VERSION_KEY = 'ingredient_index:version'
+
+
+class IngredientIndex:
+    """Инвертированный индекс «ингредиент -> рецепты» в памяти процесса.
+
+    Идентификаторы хранятся в компактных массивах ``array('L')``.
+    Индекс строится при первом обращении и точечно обновляется
+    сигналами ``IngredientInRecipe`` в процессе, где была правка.
+    Каждая правка после коммита поднимает версию в БД, остальные
+    процессы сверяют её не реже, чем раз в
+    ``INGREDIENT_INDEX_CHECK_INTERVAL`` секунд, и перестраивают индекс
+    в фоне.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._recipes = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._rebuilding = False
+
+    @staticmethod
+    def _current_version():
+        return versions.current(VERSION_KEY)
+
+    @staticmethod
+    def publish():
+        return versions.bump(VERSION_KEY)
+
+    def invalidate(self):
+        """Полная перестройка после массовых правок, например импорта.
+
+        До её окончания процесс отвечает по прежнему индексу.
+        """
+        self.publish()
+        self._checked_at = 0.0
+
+    def _load(self):
+        version = self._current_version()
+        postings = {}
+        recipes = {}
+        rows = (IngredientInRecipe.objects
+                .order_by('recipe_id', 'ingredient_id')
+                .values_list('recipe_id', 'ingredient_id')
+                .iterator(chunk_size=10000))
+        for recipe_id, ingredient_id in rows:
+            recipes.setdefault(recipe_id, array('L')).append(ingredient_id)
+            postings.setdefault(ingredient_id, array('L')).append(recipe_id)
+        return version, postings, recipes
+
+    def build(self):
+        """Читает индекс из БД без блокировки и подменяет текущий."""
+        version, postings, recipes = self._load()
+        with self._lock:
+            self._postings = postings
+            self._recipes = recipes
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def warm_up(self):
+        try:
+            self.build()
+        except DatabaseError:
+            pass
+
+    def _rebuild(self):
+        try:
+            self.warm_up()
+        finally:
+            self._rebuilding = False
+            connection.close()
+
+    def _ensure_fresh(self):
+        """Строит индекс при первом обращении, дальше - в фоне.
+
+        Устаревший индекс перестраивается в отдельном потоке, а запросы
+        до подмены получают ответ по прежнему.
+        """
+        if self._version is None:
+            self.build()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < settings.INGREDIENT_INDEX_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if self._rebuilding or self._current_version() == self._version:
+            return
+        self._rebuilding = True
+        threading.Thread(target=self._rebuild, name='ingredient-index',
+                         daemon=True).start()
+
+    def _discard(self, recipe_id):
+        for ingredient_id in self._recipes.pop(recipe_id, ()):
+            posting = self._postings.get(ingredient_id)
+            if posting is None:
+                continue
+            posting.remove(recipe_id)
+            if not posting:
+                del self._postings[ingredient_id]
+
+    def refresh_recipe(self, recipe_id):
+        """Обновляет рецепт после коммита правки.
+
+        Если с последней сверки других правок не было, индекс процесса
+        получает опубликованную версию и не перестраивается. Иначе
+        чужие правки подтянет фоновая перестройка.
+        """
+        previous, version = self.publish()
+        if self._version is None:
+            return
+        with self._lock:
+            self._discard(recipe_id)
+            ingredient_ids = array('L', (
+                IngredientInRecipe.objects
+                .filter(recipe_id=recipe_id)
+                .order_by('ingredient_id')
+                .values_list('ingredient_id', flat=True)
+            ))
+            if ingredient_ids:
+                self._recipes[recipe_id] = ingredient_ids
+                for ingredient_id in ingredient_ids:
+                    self._postings.setdefault(
+                        ingredient_id, array('L')).append(recipe_id)
+            if previous == self._version:
+                self._version = version
+
+    def match(self, ingredient_ids):
+        with self._lock:
+            self._ensure_fresh()
+            hits = Counter()
+            for ingredient_id in set(ingredient_ids):
+                hits.update(self._postings.get(ingredient_id, ()))
+            buckets = defaultdict(list)
+            for recipe_id, matched in hits.items():
+                buckets[matched, len(self._recipes[recipe_id])].append(
+                    recipe_id)
+        return MatchResult(buckets)
+
+
+class MatchResult(Sequence):
+    """Рецепты, упорядоченные по доле имеющихся ингредиентов.
+
+    Элементы - кортежи ``(recipe_id, matched, total)``. Рецепты
+    сгруппированы по паре ``(matched, total)``, поэтому сортируются
+    только группы, а кортежи собираются для запрошенной страницы.
+    """
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._keys = sorted(
+            buckets, key=lambda key: (-key[0] / key[1], -key[0]))
+        self._length = sum(map(len, buckets.values()))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            item = self[index:index + 1 or None]
+            if not item:
+                raise IndexError(index)
+            return item[0]
+        start, stop, step = index.indices(self._length)
+        page = []
+        offset = 0
+        for key in self._keys:
+            if offset >= stop:
+                break
+            recipe_ids = self._buckets[key]
+            if offset + len(recipe_ids) > start:
+                recipe_ids.sort()
+                matched, total = key
+                page.extend(
+                    (recipe_id, matched, total) for recipe_id in recipe_ids[
+                        max(start - offset, 0):stop - offset]
+                )
+            offset += len(recipe_ids)
+        return page[::step]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,86 @@
+import base64
+import io
+import os
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer, orjson
+
+
+def recipe_page(page_size, ingredients):
+    tags = [{'id': pk, 'name': f'Тег {pk}', 'slug': f'tag_{pk}',
+             'color': '#E26C2D'} for pk in range(1, 4)]
+    return {
+        'count': 1000,
+        'next': 'http://foodgram.example/api/recipes/?page=3',
+        'previous': 'http://foodgram.example/api/recipes/?page=1',
+        'results': [{
+            'id': pk,
+            'tags': tags,
+            'author': {
+                'email': f'user{pk}@example.com', 'id': pk,
+                'username': f'user{pk}', 'first_name': 'Вася',
+                'last_name': 'Пупкин', 'is_subscribed': False,
+            },
+            'ingredients': [{
+                'id': number, 'name': f'Ингредиент {number}',
+                'measurement_unit': 'г', 'amount': number * 10,
+            } for number in range(1, ingredients + 1)],
+            'is_favorited': True,
+            'is_in_shopping_cart': False,
+            'name': f'Рецепт {pk}',
+            'image': f'http://foodgram.example/media/recipes/{pk}.png',
+            'text': 'Описание приготовления рецепта. ' * 30,
+            'cooking_time': 45,
+        } for pk in range(1, page_size + 1)],
+    }
+
+
+def recipe_body(image_kb, ingredients):
+    image = base64.b64encode(os.urandom(image_kb * 1024)).decode()
+    return JSONRenderer().render({
+        'ingredients': [{'id': number, 'amount': 10}
+                        for number in range(1, ingredients + 1)],
+        'tags': [1, 2],
+        'image': f'data:image/png;base64,{image}',
+        'name': 'Рецепт',
+        'text': 'Описание приготовления рецепта. ' * 30,
+        'cooking_time': 45,
+    })
+
+
+class Command(BaseCommand):
+    help = "Compare stdlib json and orjson renderers and parsers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--ingredients', type=int, default=10)
+        parser.add_argument('--image-kb', type=int, default=512)
+        parser.add_argument('--number', type=int, default=200)
+
+    def measure(self, label, function, number):
+        seconds = min(timeit.repeat(function, number=number, repeat=3))
+        microseconds = seconds / number * 1e6
+        self.stdout.write(f'{label:<40}{microseconds:>12.1f} us')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write('orjson не установлен, сравнивать не с чем.')
+            return
+        number = options['number']
+        page = recipe_page(options['page_size'], options['ingredients'])
+        body = recipe_body(options['image_kb'], options['ingredients'])
+        self.stdout.write(
+            f'page: {len(JSONRenderer().render(page))} bytes, '
+            f'recipe body: {len(body)} bytes')
+        for label, renderer in (('render json', JSONRenderer()),
+                                ('render orjson', ORJSONRenderer())):
+            self.measure(label, lambda: renderer.render(page), number)
+        for label, parser in (('parse json', JSONParser()),
+                              ('parse orjson', ORJSONParser())):
+            self.measure(label, lambda: parser.parse(io.BytesIO(body)),
+                         number)
@@ -0,0 +1,112 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+SERVERS = {
+    'wsgi': ['foodgram.wsgi:application'],
+    'asgi': ['foodgram.asgi:application',
+             '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def load(base_url, urls, concurrency, duration):
+    deadline = time.monotonic() + duration
+
+    def client(number):
+        latencies = []
+        errors = 0
+        while time.monotonic() < deadline:
+            url = base_url + urls[(number + len(latencies)) % len(urls)]
+            started = time.perf_counter()
+            try:
+                with urlopen(url, timeout=30) as response:
+                    response.read()
+            except (URLError, OSError):
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(client, range(concurrency)))
+    latencies = sorted(sum((result[0] for result in results), []))
+    return latencies, sum(result[1] for result in results)
+
+
+class Command(BaseCommand):
+    help = "Compare WSGI and ASGI throughput at equal worker counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=int, default=10)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--modes', nargs='+', default=list(SERVERS),
+                            choices=list(SERVERS))
+        parser.add_argument('urls', nargs='*')
+
+    def default_urls(self):
+        urls = ['/api/recipes/', '/api/tags/',
+                '/api/ingredients/?name=%D0%B0']
+        recipe = Recipe.objects.only('id').first()
+        if recipe:
+            urls.append(f'/api/recipes/{recipe.id}/')
+        return urls
+
+    def wait_ready(self, base_url, server):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('Сервер завершился при запуске.')
+            try:
+                with urlopen(base_url + '/api/tags/', timeout=1):
+                    return
+            except (URLError, OSError):
+                time.sleep(0.2)
+        raise CommandError('Сервер не запустился за 30 секунд.')
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or self.default_urls()
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        self.stdout.write(
+            f'workers={options["workers"]} '
+            f'concurrency={options["concurrency"]} '
+            f'duration={options["duration"]}s urls={urls}')
+        self.stdout.write(
+            f'{"mode":<6}{"requests":>10}{"req/s":>10}'
+            f'{"p50, ms":>10}{"p95, ms":>10}{"errors":>8}')
+        for mode in options['modes']:
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', *SERVERS[mode],
+                 '--workers', str(options['workers']),
+                 '--bind', f'127.0.0.1:{options["port"]}',
+                 '--log-level', 'warning'],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, 'SERVER_MODE': mode},
+            )
+            try:
+                self.wait_ready(base_url, server)
+                latencies, errors = load(base_url, urls,
+                                         options['concurrency'],
+                                         options['duration'])
+            finally:
+                server.terminate()
+                server.wait()
+            if not latencies:
+                raise CommandError(f'{mode}: нет успешных запросов.')
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f'{mode:<6}{len(latencies):>10}'
+                f'{len(latencies) / options["duration"]:>10.1f}'
+                f'{statistics.median(latencies) * 1000:>10.1f}'
+                f'{p95 * 1000:>10.1f}{errors:>8}')
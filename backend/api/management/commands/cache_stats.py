@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import NAMESPACES, STATS
+
+
+class Command(BaseCommand):
+    help = "Show hits, misses and evictions of the API cache namespaces"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счётчики после вывода')
+
+    def handle(self, *args, **options):
+        header = ('namespace', *STATS, 'hit_rate')
+        rows = []
+        for name, namespace in sorted(NAMESPACES.items()):
+            stats = namespace.read_stats()
+            hits = stats['l1_hits'] + stats['l2_hits']
+            total = hits + stats['misses']
+            rate = f'{hits / total:.1%}' if total else '-'
+            rows.append((name, *map(str, stats.values()), rate))
+            if options['reset']:
+                namespace.reset_stats()
+        widths = [max(len(row[i]) for row in (header, *rows))
+                  for i in range(len(header))]
+        for row in (header, *rows):
+            self.stdout.write('  '.join(
+                value.ljust(width)
+                for value, width in zip(row, widths)).rstrip())
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import export_recipes
+from api.renderers import NDJSONRenderer
+
+
+def last_exported_id(path):
+    """id последнего целого рецепта в файле, недописанный хвост срезается."""
+    with open(path, 'rb+') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        tail = b''
+        while position > 0 and tail.count(b'\n') < 2:
+            step = min(64 * 1024, position)
+            position -= step
+            file.seek(position)
+            tail = file.read(step) + tail
+        complete = tail[:tail.rfind(b'\n') + 1]
+        file.truncate(position + len(complete))
+    lines = complete.splitlines()
+    return json.loads(lines[-1])['id'] if lines else 0
+
+
+class Command(BaseCommand):
+    help = "Export recipes with ingredients, tags and author as NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Файл, по умолчанию stdout')
+        parser.add_argument('--after', type=int, default=0,
+                            help='Выгрузить рецепты с id больше этого')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить выгрузку в --output')
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        after = options['after']
+        mode = 'wb'
+        if options['resume']:
+            if not options['output']:
+                raise CommandError('--resume работает только с --output.')
+            if os.path.exists(options['output']):
+                after = last_exported_id(options['output'])
+                mode = 'ab'
+        renderer = NDJSONRenderer()
+        output = (open(options['output'], mode) if options['output']
+                  else sys.stdout.buffer)
+        exported = 0
+        try:
+            for recipes in export_recipes(after, options['chunk_size']):
+                output.write(renderer.render(recipes))
+                output.flush()
+                exported += len(recipes)
+        finally:
+            if options['output']:
+                output.close()
+        self.stderr.write(f'Выгружено рецептов: {exported}, после id {after}.')
@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importer import READERS, Importer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Import recipes from an NDJSON or CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=tuple(READERS),
+                            help='По умолчанию - по расширению файла')
+        parser.add_argument('--author',
+                            help='Автор для строк без поля author')
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument('--threads', type=int)
+
+    def handle(self, *args, **options):
+        reader = READERS[options['format'] or (
+            'csv' if options['path'].lower().endswith('.csv') else 'ndjson')]
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден.')
+        importer = Importer(default_author=author,
+                            chunk_size=options['chunk_size'],
+                            threads=options['threads'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as file:
+            report = importer.run(reader(file))
+        for error in report['errors']:
+            self.stderr.write(
+                f'строка {error["line"]}: '
+                f'{json.dumps(error["errors"], ensure_ascii=False)}')
+        self.stdout.write(f'Загружено рецептов: {report["created"]}, '
+                          f'с ошибками: {report["failed"]}.')
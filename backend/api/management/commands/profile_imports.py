@@ -0,0 +1,90 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)$')
+
+COLD_START = '''
+import io
+import json
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+started = time.perf_counter()
+module = __import__(sys.argv[1], fromlist=['application'])
+imported = time.perf_counter()
+if sys.argv[2]:
+    environ = {'PATH_INFO': sys.argv[2], 'wsgi.errors': io.StringIO()}
+    setup_testing_defaults(environ)
+    b''.join(module.application(environ, lambda *args: None))
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'request': served - imported}))
+'''
+
+
+class Command(BaseCommand):
+    help = "Profile imports and cold start of a worker module"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='foodgram.wsgi')
+        parser.add_argument('--path', default='/api/tags/',
+                            help='Первый запрос после импорта, "" - без него')
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument('--group', action='store_true',
+                            help='Суммировать по пакетам верхнего уровня')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def run(self, *flags):
+        result = subprocess.run(
+            [sys.executable, *flags, '-c', COLD_START,
+             self.options['module'], self.options['path']],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ,
+                 'DJANGO_SETTINGS_MODULE': os.environ.get(
+                     'DJANGO_SETTINGS_MODULE', 'foodgram.settings')},
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+    def report_imports(self, trace):
+        own = Counter()
+        total = {}
+        for line in trace.splitlines():
+            match = LINE.match(line)
+            if match is None:
+                continue
+            module = match.group(3).strip()
+            if self.options['group']:
+                module = module.split('.')[0]
+            own[module] += int(match.group(1))
+            total.setdefault(module, f'{int(match.group(2)) / 1000:.1f}')
+        if self.options['group']:
+            total = {}
+        self.stdout.write(f'{"self, ms":>10}{"cumulative, ms":>16}  module')
+        for module, microseconds in own.most_common(self.options['top']):
+            self.stdout.write(f'{microseconds / 1000:>10.1f}'
+                              f'{total.get(module, ""):>16}  {module}')
+        self.stdout.write(f'{sum(own.values()) / 1000:>10.1f}'
+                          f'{"":>16}  всего модулей: {len(own)}')
+
+    def handle(self, *args, **options):
+        self.options = options
+        _, trace = self.run('-X', 'importtime')
+        self.report_imports(trace)
+        timings = [self.run()[0] for _ in range(options['repeat'])]
+        imported = statistics.median(run['import'] for run in timings)
+        served = statistics.median(run['request'] for run in timings)
+        self.stdout.write(
+            f'\nхолодный старт (медиана из {options["repeat"]}): '
+            f'импорт {imported * 1000:.1f} ms, '
+            f'первый запрос {served * 1000:.1f} ms, '
+            f'всего {(imported + served) * 1000:.1f} ms')
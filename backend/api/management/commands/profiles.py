@@ -0,0 +1,96 @@
+import io
+import pstats
+import statistics
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import load_records
+
+
+class Command(BaseCommand):
+    help = "List profiled requests and summarize top functions per endpoint"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint',
+                            help='Сводка по эндпоинту, например '
+                                 'RecipeViewSet.list')
+        parser.add_argument('--query', default='',
+                            help='Только запросы, в строке параметров '
+                                 'которых есть эта подстрока')
+        parser.add_argument('--id', help='Один профиль по X-Profile-Id')
+        parser.add_argument('--sort', default='cumulative',
+                            choices=('cumulative', 'tottime', 'calls'))
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--recent', action='store_true',
+                            help='Список последних профилей')
+
+    def handle(self, *args, **options):
+        records = [record for record in load_records()
+                   if options['query'] in record['query']]
+        if options['id']:
+            records = [record for record in records
+                       if record['id'] == options['id']]
+        elif options['endpoint']:
+            records = [record for record in records
+                       if record['endpoint'] == options['endpoint']]
+        if not records:
+            raise CommandError('Профилей не найдено.')
+        if options['recent']:
+            self.recent(records[-options['top']:])
+        elif options['id'] or options['endpoint']:
+            self.summary(records, options['sort'], options['top'])
+        else:
+            self.endpoints(records)
+
+    def endpoints(self, records):
+        grouped = defaultdict(list)
+        for record in records:
+            grouped[record['endpoint']].append(record['duration'])
+        self.stdout.write(f'{"endpoint":<40} {"count":>6} {"median ms":>10} '
+                          f'{"max ms":>10}')
+        for endpoint, durations in sorted(
+                grouped.items(), key=lambda item: -sum(item[1])):
+            self.stdout.write(
+                f'{endpoint:<40} {len(durations):>6} '
+                f'{statistics.median(durations) * 1000:>10.1f} '
+                f'{max(durations) * 1000:>10.1f}')
+
+    def recent(self, records):
+        for record in records:
+            started_at = datetime.fromtimestamp(record['started_at'])
+            query = f'?{record["query"]}' if record['query'] else ''
+            self.stdout.write(
+                f'{record["id"]}  {started_at:%Y-%m-%d %H:%M:%S}  '
+                f'{record["duration"] * 1000:8.1f} ms  {record["status"]}  '
+                f'{record["method"]} {record["path"]}{query}')
+
+    def summary(self, records, sort, top):
+        stats = None
+        stream = io.StringIO()
+        allocations = Counter()
+        for record in records:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(record['stats_path'],
+                                         stream=stream)
+                else:
+                    stats.add(record['stats_path'])
+            except OSError:
+                continue
+            for location, size, _ in record['allocations']:
+                allocations[location] += size
+        if stats is None:
+            raise CommandError('Файлы профилей уже удалены.')
+        durations = [record['duration'] for record in records]
+        self.stdout.write(
+            f'Запросов: {len(records)}, медиана '
+            f'{statistics.median(durations) * 1000:.1f} ms, пик памяти '
+            f'{max(record["peak_memory"] for record in records) / 1024:.0f}'
+            f' KiB')
+        stats.sort_stats(sort).print_stats(top)
+        self.stdout.write(stream.getvalue())
+        self.stdout.write('Выделения памяти (KiB, сумма по запросам):')
+        for location, size in allocations.most_common(top):
+            self.stdout.write(f'{size / 1024:10.1f}  {location}')
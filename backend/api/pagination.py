@@ -1,7 +1,13 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from django.conf import settings
 
 
 class PageSizeControlPagination(PageNumberPagination):
     page_size = settings.PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class UsernameCursorPagination(CursorPagination):
+    ordering = 'username'
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'limit'
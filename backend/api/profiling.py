@@ -0,0 +1,206 @@
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+)
+
+
+def profile_dir():
+    return Path(settings.PROFILE_DIR)
+
+
+def endpoint_name(request):
+    """``RecipeViewSet.list`` для вьюсетов, иначе имя маршрута."""
+    match = request.resolver_match
+    if match is None:
+        return request.path
+    view = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if view is not None and action is not None:
+        return f'{view.__name__}.{action}'
+    return match.view_name or request.path
+
+
+def is_staff(request):
+    """Сотрудник по сессии или по токену DRF.
+
+    Токен DRF проверяет только в представлении, поэтому здесь он
+    разбирается отдельно и только для запросов с заголовком.
+    """
+    if getattr(request, 'user', None) and request.user.is_staff:
+        return True
+    try:
+        found = TokenAuthentication().authenticate(Request(request))
+    except AuthenticationFailed:
+        return False
+    return found is not None and found[0].is_staff
+
+
+def allocations(before, after):
+    if before is None:
+        stats = after.statistics('lineno')
+        return [(str(stat.traceback[0]), stat.size, stat.count)
+                for stat in stats[:settings.PROFILE_TOP]]
+    stats = after.compare_to(before, 'lineno')
+    return [(str(stat.traceback[0]), stat.size_diff, stat.count_diff)
+            for stat in stats[:settings.PROFILE_TOP]]
+
+
+def save(record, profiler):
+    """Кладёт профиль в кольцевой буфер на диске.
+
+    Каждый запрос - пара файлов ``<id>.prof`` (pstats) и
+    ``<id>.json`` (описание и выделения памяти); JSON пишется
+    последним, поэтому по нему видны только готовые записи. Старые
+    записи сверх ``PROFILE_KEEP`` удаляются.
+    """
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f'{record["id"]}.prof')
+    temporary = directory / f'{record["id"]}.tmp'
+    temporary.write_text(json.dumps(record, ensure_ascii=False))
+    temporary.replace(directory / f'{record["id"]}.json')
+    for old in sorted(directory.glob('*.json'))[:-settings.PROFILE_KEEP]:
+        for path in (old, old.with_suffix('.prof')):
+            path.unlink(missing_ok=True)
+
+
+def load_records(directory=None):
+    records = []
+    for path in sorted((directory or profile_dir()).glob('*.json')):
+        try:
+            record = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        record['stats_path'] = str(path.with_suffix('.prof'))
+        records.append(record)
+    return records
+
+
+class ProfilingMiddleware:
+    """Профиль cProfile и выделения памяти tracemalloc для запроса.
+
+    Профилируется доля ``PROFILE_SAMPLE_RATE`` запросов и запросы
+    сотрудников с заголовком ``X-Profile``; им в ответ приходит
+    ``X-Profile-Id``. В процессе профилируется один запрос за раз,
+    остальные в это время идут как обычно: tracemalloc общий для
+    всех потоков. Middleware работает и в синхронной, и в асинхронной
+    цепочке, поэтому под ASGI не добавляет переходов между потоками.
+    cProfile видит только свой поток: у асинхронных представлений
+    это цикл событий без кода, вынесенного в ``sync_to_async``, у
+    потоковых ответов не учитывается отдача тела.
+    Результаты читает команда ``profiles``.
+    """
+
+    sync_capable = True
+    async_capable = True
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        rate = settings.PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def wanted(self, request):
+        if settings.PROFILE_HEADER in request.META:
+            return is_staff(request)
+        return self.sampled()
+
+    async def awanted(self, request):
+        if settings.PROFILE_HEADER in request.META:
+            return await sync_to_async(is_staff)(request)
+        return self.sampled()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.wanted(request) or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profile = Profile()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.stop()
+            return profile.save(request, response)
+        finally:
+            self.lock.release()
+
+    async def __acall__(self, request):
+        if (not await self.awanted(request)
+                or not self.lock.acquire(blocking=False)):
+            return await self.get_response(request)
+        try:
+            profile = Profile()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profile.stop()
+            return await sync_to_async(profile.save)(request, response)
+        finally:
+            self.lock.release()
+
+
+class Profile:
+    """Замер одного запроса: от создания до ``stop()``."""
+
+    def __init__(self):
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+            self.before = None
+        else:
+            self.before = tracemalloc.take_snapshot().filter_traces(
+                ALLOCATION_FILTERS)
+        tracemalloc.reset_peak()
+        self.profiler = cProfile.Profile()
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+        self.peak = tracemalloc.get_traced_memory()[1]
+        self.after = tracemalloc.take_snapshot().filter_traces(
+            ALLOCATION_FILTERS)
+        if self.started_tracing:
+            tracemalloc.stop()
+
+    def save(self, request, response):
+        record = {
+            'id': f'{time.time_ns()}-{os.getpid()}',
+            'endpoint': endpoint_name(request),
+            'method': request.method,
+            'path': request.path,
+            'query': request.META.get('QUERY_STRING', ''),
+            'status': response.status_code,
+            'started_at': self.started_at,
+            'duration': self.duration,
+            'peak_memory': self.peak,
+            'allocations': allocations(self.before, self.after),
+        }
+        save(record, self.profiler)
+        if settings.PROFILE_HEADER in request.META:
+            response['X-Profile-Id'] = record['id']
+        return response
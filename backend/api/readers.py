@@ -0,0 +1,276 @@
+from django.conf import settings
+from django.db.models import Prefetch
+
+from recipes.models import (Favorite, IngredientInRecipe, Recipe,
+                            Shopping_cart, Tag)
+from users.models import Subscribe
+
+from . import cache
+from .registry import registry
+
+RECIPE_FIELDS = ('id', 'tags', 'author', 'ingredients',
+                 'is_favorited', 'is_in_shopping_cart',
+                 'name', 'image', 'text', 'cooking_time')
+RECIPE_COLUMNS = ('name', 'image', 'text', 'cooking_time')
+RECIPE_RELATIONS = ('tags', 'author', 'ingredients')
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+class Projection:
+    """Поля ответа о рецепте, запрошенные ``?fields=`` и ``?expand=``.
+
+    Без параметров ответ полный. Иначе в ответ попадают поля из
+    ``fields`` и ``expand``, а связи не из ``expand`` отдаются списком
+    id (автор - его id). ``flags=False`` убирает из автора
+    ``is_subscribed``, зависящий от пользователя.
+    """
+
+    __slots__ = ('fields', 'expand', 'flags')
+
+    def __init__(self, fields=None, expand=None, flags=True):
+        self.flags = flags
+        if fields is None and expand is None:
+            self.fields = RECIPE_FIELDS
+            self.expand = frozenset(RECIPE_RELATIONS)
+            return
+        requested = set(fields or RECIPE_FIELDS)
+        self.expand = frozenset(expand or ())
+        self.fields = tuple(field for field in RECIPE_FIELDS
+                            if field in requested or field in self.expand)
+
+    @property
+    def columns(self):
+        columns = ['id']
+        if 'author' in self.fields:
+            columns.append('author_id')
+        columns.extend(
+            field for field in RECIPE_COLUMNS if field in self.fields)
+        return columns
+
+    @property
+    def complete(self):
+        """Нужны все части фрагмента рецепта, включая поля автора."""
+        return (set(RECIPE_COLUMNS + RECIPE_RELATIONS) <= set(self.fields)
+                and 'author' in self.expand)
+
+
+FULL = Projection()
+
+
+def image_url(name, request):
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def related_ids(model, field, user, ids):
+    """id из ``ids``, с которыми у пользователя есть связь ``model``."""
+    if not ids or user is None or not user.is_authenticated:
+        return set()
+    return set(model.objects.filter(user=user, **{f'{field}_id__in': ids})
+               .values_list(f'{field}_id', flat=True))
+
+
+def load_fragments(recipe_ids, projection=FULL):
+    """Не зависящие от пользователя части рецептов из БД.
+
+    Читаются только колонки и связи, нужные ``projection``. Для полной
+    проекции теги, ингредиенты и поля автора - полные, картинка - имя
+    файла. Автор хранится во фрагменте: правка профиля поднимает
+    ``updated_at`` рецептов автора, поэтому его данные меняются вместе
+    с ключом фрагмента и ETag.
+    """
+    fields = projection.fields
+    columns = [column for column in RECIPE_COLUMNS if column in fields]
+    if 'author' in projection.expand:
+        columns.extend(f'author__{field}' for field in AUTHOR_FIELDS)
+    elif 'author' in fields:
+        columns.append('author_id')
+    fragments = {}
+    for row in Recipe.objects.filter(id__in=recipe_ids).values('id',
+                                                               *columns):
+        fragment = {column: row[column]
+                    for column in ('id', *RECIPE_COLUMNS) if column in row}
+        if 'author' in projection.expand:
+            fragment['author'] = {field: row[f'author__{field}']
+                                  for field in AUTHOR_FIELDS}
+        elif 'author' in fields:
+            fragment['author'] = {'id': row['author_id']}
+        for relation in ('tags', 'ingredients'):
+            if relation in fields:
+                fragment[relation] = []
+        fragments[row['id']] = fragment
+    if 'tags' in fields:
+        for recipe_id, tag_id in (
+            Recipe.tags.through.objects
+            .filter(recipe_id__in=list(fragments))
+            .order_by('tag_id')
+            .values_list('recipe_id', 'tag_id')
+        ):
+            tag = registry.tag(tag_id)
+            if tag is not None:
+                fragments[recipe_id]['tags'].append(tag.as_dict())
+    if 'ingredients' in fields:
+        for recipe_id, ingredient_id, amount in (
+            IngredientInRecipe.objects
+            .filter(recipe_id__in=list(fragments))
+            .order_by('id')
+            .values_list('recipe_id', 'ingredient_id', 'amount')
+        ):
+            ingredient = registry.ingredient(ingredient_id)
+            if ingredient is None:
+                continue
+            fragments[recipe_id]['ingredients'].append({
+                'id': ingredient_id,
+                'name': ingredient.name,
+                'measurement_unit': ingredient.measurement_unit,
+                'amount': amount,
+            })
+    return fragments
+
+
+def fragment_key(row, version):
+    return (f"{row['id']}:{int(row['updated_at'].timestamp() * 10 ** 6)}"
+            f":{version}")
+
+
+def recipe_fragments(rows, projection=FULL):
+    """Части рецептов из пространства кэша ``fragments``.
+
+    Ключ - id и ``updated_at``, который меняется при любой правке
+    рецепта, его тегов, ингредиентов и автора, и версия реестра, с которой
+    взяты названия тегов и ингредиентов. Старые версии просто
+    перестают читаться, а процесс с устаревшим реестром не может
+    записать старые названия под новый ключ.
+
+    В кэше лежат только полные фрагменты. Промахи неполной
+    ``projection`` читают из БД только нужное и в кэш не пишутся.
+    """
+    version = registry.version
+    keys = {fragment_key(row, version): row['id'] for row in rows}
+    fragments = {keys[key]: fragment for key, fragment
+                 in cache.fragments.get_many(keys).items()}
+    missing = [recipe_id for recipe_id in keys.values()
+               if recipe_id not in fragments]
+    if missing and not projection.complete:
+        fragments.update(load_fragments(missing, projection))
+    elif missing:
+        versions = cache.fragments.versions()
+        loaded = load_fragments(missing)
+        cache.fragments.set_many(
+            {key: loaded[recipe_id] for key, recipe_id in keys.items()
+             if recipe_id in loaded},
+            versions=versions)
+        fragments.update(loaded)
+    return fragments
+
+
+def build_recipes(rows, request, projection=FULL):
+    """Рецепты в схеме RecipeReadSerializer из строк ``.values()``.
+
+    Строкам достаточно ``id`` и ``updated_at``: остальное собирается
+    из фрагментов ``recipe_fragments()`` одним multi-get на страницу,
+    флаги пользователя - отдельными запросами. Строки без
+    ``updated_at`` (выгрузка каталога) читают фрагменты из БД мимо
+    кэша.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    if 'updated_at' in rows[0]:
+        fragments = recipe_fragments(rows, projection)
+    else:
+        fragments = load_fragments([row['id'] for row in rows], projection)
+    # Рецепт мог быть удалён между чтением строк и фрагментов.
+    rows = [fragments[row['id']] for row in rows if row['id'] in fragments]
+    fields = projection.fields
+    expand = projection.expand
+    recipe_ids = [row['id'] for row in rows]
+    user = getattr(request, 'user', None)
+    values = {
+        'id': lambda row: row['id'],
+        'name': lambda row: row['name'],
+        'image': lambda row: image_url(row['image'], request),
+        'text': lambda row: row['text'],
+        'cooking_time': lambda row: row['cooking_time'],
+    }
+    if 'tags' in expand:
+        values['tags'] = lambda row: row['tags']
+    else:
+        values['tags'] = lambda row: [tag['id'] for tag in row['tags']]
+    if 'author' in expand:
+        if projection.flags:
+            subscribed = related_ids(
+                Subscribe, 'author', user,
+                {row['author']['id'] for row in rows})
+            values['author'] = lambda row: {
+                **row['author'],
+                'is_subscribed': row['author']['id'] in subscribed,
+            }
+        else:
+            values['author'] = lambda row: row['author']
+    else:
+        values['author'] = lambda row: row['author']['id']
+    if 'ingredients' in expand:
+        values['ingredients'] = lambda row: row['ingredients']
+    else:
+        values['ingredients'] = lambda row: [
+            ingredient['id'] for ingredient in row['ingredients']]
+    if 'is_favorited' in fields:
+        favorited = related_ids(Favorite, 'recipe', user, recipe_ids)
+        values['is_favorited'] = lambda row: row['id'] in favorited
+    if 'is_in_shopping_cart' in fields:
+        in_cart = related_ids(Shopping_cart, 'recipe', user, recipe_ids)
+        values['is_in_shopping_cart'] = lambda row: row['id'] in in_cart
+    return [{field: values[field](row) for field in fields} for row in rows]
+
+
+class RecipeReader:
+    """Замена RecipeReadSerializer для чтения.
+
+    Принимает строки ``read_queryset()`` и возвращает ту же схему
+    ответа без полей и сериализаторов DRF.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        rows = self.instance if self.many else [self.instance]
+        recipes = build_recipes(rows, self.context.get('request'),
+                                self.context.get('projection', FULL))
+        return recipes if self.many else recipes[0]
+
+
+def use_reader():
+    return settings.RECIPE_READER == 'compiled'
+
+
+def read_queryset(queryset, projection=FULL):
+    """Выборка только колонок и связей, нужных ``projection``."""
+    if use_reader():
+        return queryset.values('id', 'updated_at')
+    queryset = queryset.only(*projection.columns)
+    if 'author' in projection.expand:
+        queryset = queryset.select_related('author')
+    if 'tags' in projection.fields:
+        queryset = queryset.prefetch_related(
+            Prefetch('tags', Tag.objects.only('id')))
+    if 'ingredients' in projection.fields:
+        queryset = queryset.prefetch_related('recipes')
+    return queryset
+
+
+def read_in_order(queryset, ids):
+    """Рецепты с ``ids`` в порядке ``ids`` и id, которых не нашлось."""
+    found = {}
+    for recipe in queryset.filter(pk__in=ids).order_by():
+        found[recipe['id'] if isinstance(recipe, dict) else recipe.pk] = recipe
+    return ([found[pk] for pk in ids if pk in found],
+            [pk for pk in ids if pk not in found])
@@ -0,0 +1,135 @@
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from recipes.models import Ingredient, Tag
+
+from . import versions
+
+VERSION_KEY = 'registry:version'
+
+
+class TagRecord:
+    __slots__ = ('id', 'name', 'slug', 'color')
+
+    def __init__(self, id, name, slug, color):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.color = color
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name,
+                'slug': self.slug, 'color': self.color}
+
+
+class IngredientRecord:
+    __slots__ = ('id', 'name', 'measurement_unit')
+
+    def __init__(self, id, name, measurement_unit):
+        self.id = id
+        self.name = name
+        self.measurement_unit = sys.intern(measurement_unit)
+
+
+class Registry:
+    """Теги и ингредиенты в памяти процесса.
+
+    Записи - объекты со ``__slots__``, единицы измерения интернированы.
+    Изменение тега или ингредиента поднимает версию в БД,
+    остальные процессы сверяют её не чаще, чем раз в
+    ``REGISTRY_CHECK_INTERVAL`` секунд. Неизвестный идентификатор
+    вызывает перезагрузку не чаще того же интервала, поэтому новые
+    записи видны сразу; удалённой записи соответствует ``None``.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._tags = {}
+        self._ingredients = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._reloaded_at = 0.0
+
+    @staticmethod
+    def _current_version():
+        return versions.current(VERSION_KEY)
+
+    def load(self):
+        with self._lock:
+            version = self._current_version()
+            self._tags = {
+                tag[0]: TagRecord(*tag) for tag in
+                Tag.objects.values_list('id', 'name', 'slug', 'color')
+            }
+            self._ingredients = {
+                ingredient[0]: IngredientRecord(*ingredient)
+                for ingredient in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit').iterator(
+                        chunk_size=5000)
+            }
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def warm_up(self):
+        try:
+            self.load()
+        except DatabaseError:
+            pass
+
+    def invalidate(self):
+        versions.bump(VERSION_KEY)
+        self._version = None
+
+    def _ensure_fresh(self):
+        if self._version is None:
+            self.load()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < settings.REGISTRY_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        if self._current_version() != self._version:
+            self.load()
+
+    @property
+    def version(self):
+        """Версия, по которой загружены записи этого процесса."""
+        with self._lock:
+            self._ensure_fresh()
+            return self._version
+
+    def _lookup(self, attribute, pk):
+        with self._lock:
+            self._ensure_fresh()
+            record = getattr(self, attribute).get(pk)
+            now = time.monotonic()
+            if (record is None and now - self._reloaded_at
+                    >= settings.REGISTRY_CHECK_INTERVAL):
+                self._reloaded_at = now
+                self.load()
+                record = getattr(self, attribute).get(pk)
+        return record
+
+    def _records(self, attribute):
+        with self._lock:
+            self._ensure_fresh()
+            return list(getattr(self, attribute).values())
+
+    def tag(self, pk):
+        return self._lookup('_tags', pk)
+
+    def ingredient(self, pk):
+        return self._lookup('_ingredients', pk)
+
+    def tags(self):
+        return self._records('_tags')
+
+    def ingredients(self):
+        return self._records('_ingredients')
+
+
+registry = Registry()
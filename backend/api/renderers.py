@@ -0,0 +1,39 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson.
+
+    Без orjson и для ответов с отступами (browsable API, ``indent=``)
+    работает как стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or data is None or indent is not None:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        ret = orjson.dumps(data, default=self.encoder_class().default,
+                           option=orjson.OPT_NON_STR_KEYS)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = (ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+                   .replace(b'\xe2\x80\xa9', b'\\u2029'))
+        return ret
+
+
+class NDJSONRenderer(ORJSONRenderer):
+    """Список - по объекту JSON в строке, остальное - одной строкой."""
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(
+            super(NDJSONRenderer, self).render(item) + b'\n' for item in data)
@@ -1,14 +1,23 @@
+from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import IntegrityError
 from django.db.transaction import atomic
 from django.contrib.auth import get_user_model
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.models import (Change, Ingredient, IngredientInRecipe, Recipe,
+                            Tag)
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
 
 from users.models import Subscribe
 from recipes.models import Favorite, Shopping_cart
+from tasks.models import Task
+
+from .readers import (RECIPE_FIELDS, RECIPE_RELATIONS, Projection,
+                      RecipeReader, build_recipes, use_reader)
+from .registry import registry
 
 
 User = get_user_model()
@@ -16,6 +25,8 @@ User = get_user_model()
 
 class SubscriptionMixin:
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (
             request
@@ -49,6 +60,85 @@ class RecipeShortSerializer(serializers.ModelSerializer):
                   'image', 'cooking_time')
 
 
+class RecipeMatchSerializer(RecipeShortSerializer):
+    matched = serializers.IntegerField(read_only=True)
+    total = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeShortSerializer.Meta):
+        fields = RecipeShortSerializer.Meta.fields + (
+            'matched', 'total', 'coverage'
+        )
+
+
+class IdListField(serializers.CharField):
+    default_error_messages = {
+        'invalid_ids': 'Укажите id через запятую.',
+        'max_ids': 'Можно указать не больше {max_ids} id.',
+    }
+
+    def __init__(self, max_ids, **kwargs):
+        self.max_ids = max_ids
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        try:
+            ids = [int(pk) for pk in data.split(',') if pk.strip()]
+        except ValueError:
+            self.fail('invalid_ids')
+        if not ids or min(ids) < 1:
+            self.fail('invalid_ids')
+        if len(ids) > self.max_ids:
+            self.fail('max_ids', max_ids=self.max_ids)
+        return ids
+
+
+class NameListField(serializers.CharField):
+    default_error_messages = {
+        'invalid_names': 'Неизвестные поля: {names}.',
+    }
+
+    def __init__(self, choices, **kwargs):
+        self.choices = choices
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        names = [name.strip() for name in data.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.choices]
+        if unknown:
+            self.fail('invalid_names', names=', '.join(unknown))
+        return names
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_LIMIT
+    )
+
+
+class IngredientMatchSerializer(serializers.Serializer):
+    ingredients = IdListField(max_ids=settings.INGREDIENT_MATCH_LIMIT)
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    ids = IdListField(max_ids=settings.RECIPE_BATCH_LIMIT)
+
+
+class ExportSerializer(serializers.Serializer):
+    after = serializers.IntegerField(min_value=0, default=0)
+
+
+class SyncSerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1,
+                                     max_value=settings.SYNC_LIMIT,
+                                     default=settings.SYNC_LIMIT)
+
+
 class SubscriptionsSerializer(UsersSerializer):
     recipes_count = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
@@ -60,6 +150,8 @@ class SubscriptionsSerializer(UsersSerializer):
         read_only_fields = ('email', 'username')
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return obj.recipes.count()
 
     def get_recipes(self, obj):
@@ -74,24 +166,37 @@ class SubscriptionsSerializer(UsersSerializer):
         return serializer.data
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
+class UserRelationSerializer(serializers.ModelSerializer):
+    user = serializers.HiddenField(default=serializers.CurrentUserDefault())
+    exists_error = None
+
+    def create(self, validated_data):
+        try:
+            with atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            raise ValidationError(self.exists_error)
+
+
+class SubscribeSerializer(UserRelationSerializer):
+    exists_error = {api_settings.NON_FIELD_ERRORS_KEY: [
+        'Вы уже подписаны на этого пользователя!'
+    ]}
+
     class Meta:
         model = Subscribe
         fields = ('user', 'author')
+        read_only_fields = ('author',)
+        validators = []
 
     def validate(self, data):
-        author = self.instance
-        user = self.context.get('request').user
-        if Subscribe.objects.filter(author=author, user=user).exists():
-            raise ValidationError(
-                detail='Вы уже подписаны на этого пользователя!',
-                code=status.HTTP_400_BAD_REQUEST
-            )
-        if user == author:
+        author = self.context['author']
+        if data['user'] == author:
             raise ValidationError(
                 detail='Вы не можете подписаться на самого себя!',
                 code=status.HTTP_400_BAD_REQUEST
             )
+        data['author'] = author
         return data
 
 
@@ -107,21 +212,37 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class RegistryTagField(serializers.RelatedField):
+    def to_representation(self, value):
+        record = registry.tag(value.pk)
+        if record is None:
+            return TagSerializer(value).data
+        return record.as_dict()
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.ReadOnlyField(source='ingredient.id')
-    name = serializers.ReadOnlyField(source='ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit')
+    id = serializers.ReadOnlyField(source='ingredient_id')
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'name',
                   'measurement_unit', 'amount')
 
+    def ingredient(self, obj):
+        return registry.ingredient(obj.ingredient_id) or obj.ingredient
+
+    def get_name(self, obj):
+        return self.ingredient(obj).name
+
+    def get_measurement_unit(self, obj):
+        return self.ingredient(obj).measurement_unit
+
 
 class RecipeReadSerializer(serializers.ModelSerializer):
     author = UsersSerializer()
-    tags = TagSerializer(many=True)
+    tags = RegistryTagField(many=True, read_only=True)
     ingredients = RecipeIngredientSerializer(
         many=True, source='recipes')
     is_favorited = serializers.SerializerMethodField(read_only=True)
@@ -130,11 +251,27 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ('id', 'tags',
-                  'author', 'ingredients',
-                  'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image',
-                  'text', 'cooking_time')
+        fields = RECIPE_FIELDS
+
+    def get_fields(self):
+        fields = super().get_fields()
+        projection = self.context.get('projection')
+        if projection is None:
+            return fields
+        collapsed = {
+            'author': serializers.ReadOnlyField(source='author_id'),
+            'tags': serializers.PrimaryKeyRelatedField(many=True,
+                                                       read_only=True),
+            'ingredients': serializers.SlugRelatedField(
+                many=True, read_only=True, slug_field='ingredient_id',
+                source='recipes'),
+        }
+        return {
+            name: (collapsed[name]
+                   if name in collapsed and name not in projection.expand
+                   else fields[name])
+            for name in projection.fields
+        }
 
     def get_is_favorited(self, obj):
         user = self.context.get('request').user
@@ -147,6 +284,21 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                 and user.shopping_cart.filter(recipe=obj).exists())
 
 
+def read_serializer_class():
+    return RecipeReader if use_reader() else RecipeReadSerializer
+
+
+class RecipeFieldsSerializer(serializers.Serializer):
+    fields = NameListField(choices=RECIPE_FIELDS, required=False)
+    expand = NameListField(choices=RECIPE_RELATIONS, required=False)
+
+
+def get_projection(query_params):
+    params = RecipeFieldsSerializer(data=query_params)
+    params.is_valid(raise_exception=True)
+    return Projection(**params.validated_data)
+
+
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     id = serializers.PrimaryKeyRelatedField(
         queryset=Ingredient.objects.all()
@@ -227,45 +379,85 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        if use_reader():
+            recipes = build_recipes(
+                [{'id': instance.pk, 'updated_at': instance.updated_at}],
+                self.context.get('request'))
+            # Рецепт удалили сразу после сохранения: отвечаем по объекту.
+            if recipes:
+                return recipes[0]
         return RecipeReadSerializer(instance,
                                     context=self.context).data
 
 
-class ShoppingSerializer(serializers.ModelSerializer):
+class IngredientImportSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=settings.LINE_LIMIT_RECIPES)
+    measurement_unit = serializers.CharField(
+        max_length=settings.LINE_LIMIT_RECIPES, required=False)
+    amount = serializers.IntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(30000)]
+    )
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=settings.LINE_LIMIT_RECIPES)
+    text = serializers.CharField()
+    cooking_time = serializers.IntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(30000)]
+    )
+    author = serializers.CharField(max_length=settings.LINE_LIMIT_USERS,
+                                   required=False)
+    tags = serializers.ListField(child=serializers.CharField(),
+                                 allow_empty=False)
+    ingredients = serializers.ListField(child=IngredientImportSerializer(),
+                                        allow_empty=False)
+    image = serializers.CharField()
+
+
+class ImportFileSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+
+class ShoppingSerializer(UserRelationSerializer):
+    exists_error = {'shopping_cart': 'Рецепт уже в вашей корзине'}
+
     class Meta:
         model = Shopping_cart
         fields = (
             'user',
             'recipe',
         )
-
-    def validate(self, data):
-        if Shopping_cart.objects.filter(
-                user_id=data['user'],
-                recipe_id=data['recipe']):
-            raise serializers.ValidationError(
-                {'shopping_cart': 'Рецепт уже в вашей корзине'})
-        return data
+        validators = []
 
     def to_representation(self, instance):
         return RecipeShortSerializer(instance.recipe).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(UserRelationSerializer):
+    exists_error = {'favorite': 'Рецепт уже в вашем избранном'}
+
     class Meta:
         model = Favorite
         fields = (
             'user',
             'recipe',
         )
-
-    def validate(self, data):
-        if Favorite.objects.filter(
-                user_id=data['user'],
-                recipe_id=data['recipe']):
-            raise serializers.ValidationError(
-                {'favorite': 'Рецепт уже в вашем избранном'})
-        return data
+        validators = []
 
     def to_representation(self, instance):
         return RecipeShortSerializer(instance.recipe).data
+
+
+class TaskSerializer(serializers.ModelSerializer):
+    url = serializers.HyperlinkedIdentityField(view_name='tasks-detail')
+
+    class Meta:
+        model = Task
+        fields = ('id', 'url', 'name', 'status', 'attempts', 'result',
+                  'created_at', 'updated_at')
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Change
+        fields = ('id', 'kind', 'object_id', 'deleted', 'changed_at')
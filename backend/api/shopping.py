@@ -0,0 +1,122 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import (BigIntegerField, Count, F, Max, OuterRef,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Cast, Coalesce
+from django.http import FileResponse, HttpResponse
+from django.utils.crypto import salted_hmac
+
+from recipes.models import IngredientInRecipe, Shopping_cart, UnitConversion
+
+from .registry import registry
+
+
+def shopping_cart_totals(user):
+    """Суммы ингредиентов корзины в базовых единицах.
+
+    Единица каждой строки переводится через ``UnitConversion`` прямо
+    в запросе, поэтому «г» и «кг» одного продукта складываются в одну
+    строку. Количества приводятся к bigint до умножения и суммы.
+    """
+    conversion = UnitConversion.objects.filter(
+        unit=OuterRef('ingredient__measurement_unit')).order_by()
+    return (
+        IngredientInRecipe.objects
+        .filter(recipe__shopping_cart__user=user)
+        .annotate(
+            base_unit=Coalesce(
+                Subquery(conversion.values('base_unit')[:1]),
+                F('ingredient__measurement_unit')),
+            factor=Coalesce(
+                Subquery(conversion.values('factor')[:1]), Value(1)),
+        )
+        .values('ingredient__name', 'base_unit')
+        .annotate(total_amount=Sum(
+            Cast('amount', BigIntegerField()) * F('factor'),
+            output_field=BigIntegerField()))
+        .order_by('ingredient__name', 'base_unit')
+        .values_list('ingredient__name', 'total_amount', 'base_unit')
+    )
+
+
+def shopping_list(totals):
+    file_list = []
+    [file_list.append(
+        '{} - {} {}.'.format(*ingredient)) for ingredient in totals]
+    return 'Cписок покупок:\n' + '\n'.join(file_list)
+
+
+def cart_state(user):
+    """Хэш содержимого корзины.
+
+    Добавление меняет max id, удаление - количество, правка рецепта -
+    его ``updated_at``, изменение ингредиентов и перевода единиц -
+    версию реестра.
+    """
+    state = Shopping_cart.objects.filter(user=user).aggregate(
+        count=Count('id'), last=Max('id'),
+        updated=Max('recipe__updated_at'))
+    return hashlib.md5(repr(
+        (*state.values(), registry.version)).encode()).hexdigest()
+
+
+def user_directory(user_id):
+    return 'shopping_lists/{}'.format(
+        salted_hmac('shopping_list', user_id).hexdigest())
+
+
+def stored_list(user_id, state):
+    return f'{user_directory(user_id)}/{state}.txt'
+
+
+def save_shopping_list(user, state):
+    """Сохраняет список покупок в media, если его ещё нет.
+
+    Файл пишется во временный и переименовывается в ``<state>.txt``
+    атомарно, поэтому параллельные загрузки одного состояния не
+    видят недописанный файл и не мешают друг другу. Файлы прошлых
+    состояний корзины пользователя удаляются.
+    """
+    name = stored_list(user.pk, state)
+    if default_storage.exists(name):
+        return name
+    content = shopping_list(shopping_cart_totals(user))
+    directory = default_storage.path(user_directory(user.pk))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+            dir=directory, suffix='.tmp', delete=False) as file:
+        file.write(content.encode())
+    if default_storage.file_permissions_mode is not None:
+        os.chmod(file.name, default_storage.file_permissions_mode)
+    os.replace(file.name, default_storage.path(name))
+    for old in os.listdir(directory):
+        if old.endswith('.txt') and old != f'{state}.txt':
+            try:
+                os.remove(os.path.join(directory, old))
+            except FileNotFoundError:
+                pass
+    return name
+
+
+def shopping_list_response(name):
+    """Отдаёт сохранённый файл: через nginx или из процесса.
+
+    Файл открывается без проверки ``exists()``: его может удалить
+    сохранение нового состояния корзины. Если файла нет, поднимается
+    FileNotFoundError.
+    """
+    file = default_storage.open(name)
+    if settings.SHOPPING_LIST_X_ACCEL:
+        file.close()
+        response = HttpResponse(content_type='text/plain')
+        response['X-Accel-Redirect'] = default_storage.url(name)
+    else:
+        response = FileResponse(file, content_type='text/plain')
+    response['Content-Disposition'] = (
+        f'attachment; filename={settings.FILE_NAME}'
+    )
+    return response
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.models import (Change, Favorite, Ingredient, IngredientInRecipe,
+                            Recipe, Shopping_cart, Tag, UnitConversion)
+from recipes.tasks import compute_similar
+from tasks.queue import enqueue_on_commit
+from users.models import Subscribe, User
+
+from . import cache
+from .changes import collect, log_change, log_relation
+from .ingredient_index import ingredient_index
+from .readers import AUTHOR_FIELDS
+from .registry import registry
+
+
+M2M_CHANGES = ('post_add', 'post_remove', 'post_clear')
+
+
+def refresh_ingredient_index(recipe_id):
+    transaction.on_commit(
+        lambda: ingredient_index.refresh_recipe(recipe_id))
+
+
+def touch_recipe(recipe_id, recipe=None):
+    changes = {'similar_stale': True, 'updated_at': timezone.now()}
+    if recipe is not None:
+        for field, value in changes.items():
+            setattr(recipe, field, value)
+    Recipe.objects.filter(pk=recipe_id).update(**changes)
+    log_change(Change.RECIPE, recipe_id)
+    enqueue_on_commit(compute_similar, compute_similar.task_name)
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def ingredient_in_recipe_changed(sender, instance, **kwargs):
+    refresh_ingredient_index(instance.recipe_id)
+    touch_recipe(instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=IngredientInRecipe)
+def recipe_ingredients_changed(sender, instance, action, reverse, **kwargs):
+    if reverse or action not in M2M_CHANGES:
+        return
+    refresh_ingredient_index(instance.pk)
+    touch_recipe(instance.pk, instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, **kwargs):
+    if reverse or action not in M2M_CHANGES:
+        return
+    touch_recipe(instance.pk, instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, signal, **kwargs):
+    refresh_ingredient_index(instance.pk)
+    log_change(Change.RECIPE, instance.pk,
+               deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=Shopping_cart)
+@receiver(post_delete, sender=Shopping_cart)
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def relation_changed(sender, instance, signal, **kwargs):
+    log_relation(instance, deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=UnitConversion)
+@receiver(post_delete, sender=UnitConversion)
+def registry_changed(sender, **kwargs):
+    transaction.on_commit(registry.invalidate)
+    if sender is not UnitConversion:
+        tag = 'tags' if sender is Tag else 'ingredients'
+        transaction.on_commit(lambda: cache.invalidate_tags(tag))
+
+
+def touch_author_recipes(author_id):
+    """Рецепты с новыми данными автора - изменённые рецепты."""
+    recipe_ids = list(Recipe.objects.filter(author_id=author_id)
+                      .values_list('id', flat=True))
+    with collect():
+        Recipe.objects.filter(id__in=recipe_ids).update(
+            updated_at=timezone.now())
+        for recipe_id in recipe_ids:
+            log_change(Change.RECIPE, recipe_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(sender, instance, update_fields=None, **kwargs):
+    instance._author_fields = None
+    if instance.pk is None or (
+            update_fields is not None
+            and not set(update_fields) & set(AUTHOR_FIELDS)):
+        return
+    instance._author_fields = (
+        User.objects.filter(pk=instance.pk).values(*AUTHOR_FIELDS).first())
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    previous = getattr(instance, '_author_fields', None)
+    if previous and any(previous[field] != getattr(instance, field)
+                        for field in AUTHOR_FIELDS):
+        touch_author_recipes(instance.pk)
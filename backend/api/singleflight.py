@@ -0,0 +1,163 @@
+import fcntl
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+
+def flights():
+    return caches[settings.SINGLE_FLIGHT_CACHE_ALIAS]
+
+
+@contextmanager
+def file_lock(key):
+    """Неблокирующий ``flock`` на файл-слот ключа; даёт True, если взят.
+
+    ``add`` файлового кэша - проверка и запись, а не атомарная операция,
+    поэтому блокировку держит ядро. Она снимается и при падении
+    процесса. Ключи распределены по ``SINGLE_FLIGHT_LOCK_SLOTS``
+    файлам, чтобы их число не росло.
+    """
+    slot = int(hashlib.md5(key.encode()).hexdigest(), 16)
+    os.makedirs(settings.SINGLE_FLIGHT_LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(
+        settings.SINGLE_FLIGHT_LOCK_DIR,
+        f'{slot % settings.SINGLE_FLIGHT_LOCK_SLOTS}.lock'),
+        os.O_CREAT | os.O_RDWR)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+        else:
+            yield True
+    finally:
+        os.close(fd)
+
+
+class SingleFlight:
+    """Одно вычисление на ключ с общим результатом.
+
+    Внутри процесса одинаковые вызовы ждут Future первого. Между
+    процессами вычисляет тот, кто взял ``file_lock``, остальные ждут
+    появления значения в своём кэше ``SINGLE_FLIGHT_CACHE_ALIAS``:
+    записи на каждого пользователя не вытесняют чужие данные из
+    ``default``. Значение хранится с временем вычисления и обновляется
+    заранее с вероятностью, растущей к концу срока жизни (XFetch),
+    поэтому записи не истекают разом.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def __call__(self, key, compute, timeout=None):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            value = self._fetch(key, compute,
+                                timeout or settings.SINGLE_FLIGHT_TIMEOUT)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    @staticmethod
+    def _expired(entry):
+        _, delta, expires_at = entry
+        return (time.time() - delta * settings.SINGLE_FLIGHT_BETA
+                * math.log(1 - random.random()) >= expires_at)
+
+    @staticmethod
+    def _compute(key, compute, timeout):
+        started = time.perf_counter()
+        value = compute()
+        delta = time.perf_counter() - started
+        flights().set(key, (value, delta, time.time() + timeout), timeout)
+        return value
+
+    def _fetch(self, key, compute, timeout):
+        entry = flights().get(key)
+        if entry is not None and not self._expired(entry):
+            return entry[0]
+        with file_lock(key) as locked:
+            if locked:
+                return self._compute(key, compute, timeout)
+        if entry is not None:
+            # Запись ещё жива, её заранее обновляет другой процесс.
+            return entry[0]
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(settings.SINGLE_FLIGHT_POLL)
+            entry = flights().get(key)
+            if entry is not None:
+                return entry[0]
+            with file_lock(key) as locked:
+                if locked:
+                    # Вычислявший процесс закончил или упал.
+                    entry = flights().get(key)
+                    if entry is not None:
+                        return entry[0]
+                    return self._compute(key, compute, timeout)
+        return self._compute(key, compute, timeout)
+
+
+single_flight = SingleFlight()
+
+
+def request_key(request, *parts):
+    """Ключ запроса: URL с упорядоченными параметрами и пользователь.
+
+    Анонимные ответы общие, ответы с флагами пользователя - свои у
+    каждого пользователя.
+    """
+    query = sorted(request.query_params.lists())
+    user = request.user
+    principal = f'user:{user.pk}' if user.is_authenticated else 'anonymous'
+    digest = hashlib.md5(repr((
+        request.build_absolute_uri(request.path), query, principal,
+        *parts)).encode()).hexdigest()
+    return f'flight:{digest}'
+
+
+class SingleFlightMixin:
+    """list и retrieve через single_flight.
+
+    Ключ включает ETag ответа (``self.etag`` из ConditionalGetMixin),
+    поэтому изменения рецептов, их авторов, тегов и ингредиентов и
+    флагов пользователя сразу дают новый ключ. Без ETag запрос
+    выполняется как обычно.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.coalesce(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.coalesce(super().retrieve, request, *args, **kwargs)
+
+    def coalesce(self, handler, request, *args, **kwargs):
+        etag = getattr(self, 'etag', None)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        data = single_flight(
+            request_key(request, self.action, etag),
+            lambda: handler(request, *args, **kwargs).data)
+        return Response(data)
@@ -0,0 +1,23 @@
+import gc
+
+from django.db import connections
+from django.urls import get_resolver
+
+from .ingredient_index import ingredient_index
+from .registry import registry
+
+
+def warm_up():
+    """Подготовка процесса до первого запроса.
+
+    Загружает маршруты вместе с представлениями и сериализаторами,
+    индекс ингредиентов и реестр. С ``gunicorn --preload`` это
+    происходит один раз в мастере: соединения с БД закрываются до
+    fork, а загруженные объекты исключаются из сборки мусора, чтобы
+    она не копировала общие страницы памяти в каждый воркер.
+    """
+    get_resolver().url_patterns
+    ingredient_index.warm_up()
+    registry.warm_up()
+    connections.close_all()
+    gc.freeze()
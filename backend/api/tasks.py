@@ -0,0 +1,14 @@
+from django.urls import reverse
+
+from users.models import User
+
+from tasks.queue import task
+
+from .shopping import cart_state, save_shopping_list
+
+
+@task(name='api.render_shopping_list')
+def render_shopping_list(user_id):
+    user = User.objects.get(pk=user_id)
+    save_shopping_list(user, cart_state(user))
+    return {'file': reverse('recipes-download-shopping-cart')}
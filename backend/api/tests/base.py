@@ -0,0 +1,51 @@
+from base64 import b64encode
+from io import BytesIO
+
+from django.core.cache import caches
+from PIL import Image
+
+from api.cache import NAMESPACES
+from recipes.models import IngredientInRecipe, Recipe
+from users.models import User
+
+TEST_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'tests-{alias}',
+    }
+    for alias in ('default', 'api', 'flights')
+}
+
+
+def clear_caches():
+    for alias in TEST_CACHES:
+        caches[alias].clear()
+    for namespace in NAMESPACES.values():
+        namespace.l1.clear()
+
+
+def make_user(username, **fields):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password='password', first_name='Имя', last_name='Фамилия',
+        **fields)
+
+
+def make_recipe(author, name, tags=(), ingredients=()):
+    """Рецепт с тегами и ингредиентами ``(ingredient, amount)``."""
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание',
+        image='recipes/test.png', cooking_time=10)
+    recipe.tags.set(tags)
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                           amount=amount)
+        for ingredient, amount in ingredients)
+    return recipe
+
+
+def png_data():
+    """Картинка 1x1 в виде data URI для Base64ImageField."""
+    buffer = BytesIO()
+    Image.new('RGB', (1, 1)).save(buffer, 'PNG')
+    return f'data:image/png;base64,{b64encode(buffer.getvalue()).decode()}'
@@ -0,0 +1,92 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.registry import registry
+from recipes.models import Tag
+
+from .base import TEST_CACHES, clear_caches, make_recipe, make_user
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+    """ETag и Last-Modified для списка и детальной страницы рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('reader')
+        cls.author = make_user('author')
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast',
+                                     color='#E26C2D')
+        cls.recipe = make_recipe(cls.author, 'Рецепт', tags=[cls.tag])
+        cls.url = f'/api/recipes/{cls.recipe.pk}/'
+
+    def setUp(self):
+        clear_caches()
+        registry.invalidate()
+        self.client = APIClient()
+
+    def get(self, url, **headers):
+        return self.client.get(url, headers=headers)
+
+    def assert_not_modified(self, url, etag):
+        response = self.get(url, If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse(response.content)
+
+    def assert_etag_changes(self, url, change):
+        etag = self.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.get(url, If_None_Match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_validators(self):
+        response = self.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept', response['Vary'])
+        self.assertIn('Last-Modified', response)
+        self.assert_not_modified(self.url, response['ETag'])
+        response = self.get(self.url,
+                            If_Modified_Since=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_not_modified(self):
+        self.assert_not_modified('/api/recipes/',
+                                 self.get('/api/recipes/')['ETag'])
+
+    def test_authenticated_detail_has_no_last_modified(self):
+        self.client.force_authenticate(self.user)
+        response = self.get(self.url)
+        self.assertNotIn('Last-Modified', response)
+        self.assert_not_modified(self.url, response['ETag'])
+
+    def test_recipe_edit_changes_etag(self):
+        def edit():
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+        for url in (self.url, '/api/recipes/'):
+            with self.subTest(url=url):
+                self.assert_etag_changes(url, edit)
+
+    def test_new_recipe_changes_list_etag(self):
+        self.assert_etag_changes(
+            '/api/recipes/', lambda: make_recipe(self.author, 'Ещё рецепт'))
+
+    def test_tag_rename_changes_etag(self):
+        def rename():
+            self.tag.name = 'Поздний завтрак'
+            self.tag.save()
+        self.assert_etag_changes(self.url, rename)
+
+    def test_favorite_changes_etag(self):
+        self.client.force_authenticate(self.user)
+        self.assert_etag_changes(
+            self.url,
+            lambda: self.client.post(f'{self.url}favorite/'))
+
+    def test_renderer_changes_etag(self):
+        etag = self.get(self.url)['ETag']
+        response = self.get(self.url, Accept='text/html')
+        self.assertNotEqual(response['ETag'], etag)
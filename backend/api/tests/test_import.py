@@ -0,0 +1,120 @@
+import json
+from tempfile import TemporaryDirectory
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.registry import registry
+from recipes.models import Ingredient, Recipe, Tag
+
+from .base import TEST_CACHES, clear_caches, make_recipe, make_user, png_data
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportImportTests(TestCase):
+    """Выгрузка ``/api/recipes/export/`` загружается обратно импортом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', is_staff=True)
+        cls.author = make_user('author')
+        cls.tags = [Tag.objects.create(name=name, slug=slug, color=color)
+                    for name, slug, color in (('Завтрак', 'breakfast',
+                                               '#E26C2D'),
+                                              ('Обед', 'lunch', '#49B64E'))]
+        cls.flour, cls.milk = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('мука', 'г'), ('молоко', 'мл')))
+
+    def setUp(self):
+        clear_caches()
+        registry.invalidate()
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def export(self):
+        response = self.client.get('/api/recipes/export/')
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line
+                in b''.join(response.streaming_content).splitlines()]
+
+    def upload(self, name, content):
+        response = self.client.post('/api/recipes/import/', {
+            'file': SimpleUploadedFile(name, content.encode()),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_round_trip(self):
+        for number in range(3):
+            recipe = make_recipe(
+                self.author, f'Рецепт {number}', tags=self.tags[:number + 1],
+                ingredients=[(self.flour, 100 + number), (self.milk, 200)])
+            recipe.image = default_storage.save(
+                f'recipes/test{number}.png', ContentFile(b'png'))
+            recipe.save()
+        exported = self.export()
+        Recipe.objects.all().delete()
+        result = self.upload('recipes.ndjson', ''.join(
+            json.dumps(row, ensure_ascii=False) + '\n' for row in exported))
+        self.assertEqual(result, {'created': 3, 'failed': 0, 'errors': []})
+
+        def without_ids(rows):
+            return [{**row, 'id': None} for row in rows]
+        self.assertEqual(without_ids(self.export()), without_ids(exported))
+
+    def test_malformed_rows(self):
+        good = {
+            'name': 'Блины', 'text': 'Описание', 'cooking_time': 20,
+            'image': png_data(), 'tags': ['breakfast'],
+            'ingredients': [{'name': 'мука', 'amount': 200}],
+        }
+        lines = [
+            json.dumps(good),
+            '{"name": ',
+            '[1, 2]',
+            '',
+            json.dumps({**good, 'tags': ['unknown']}),
+            json.dumps({**good, 'ingredients': [{'name': 'соль',
+                                                 'amount': 1}]}),
+            json.dumps({**good, 'cooking_time': 0}),
+            json.dumps({**good, 'author': 'nobody'}),
+            json.dumps({**good, 'image': 'not an image'}),
+        ]
+        result = self.upload('recipes.ndjson', '\n'.join(lines))
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['failed'], 7)
+        errors = {error['line']: error['errors']
+                  for error in result['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 5, 6, 7, 8, 9])
+        self.assertIn('line', errors[2])
+        self.assertIn('line', errors[3])
+        self.assertIn('tags', errors[5])
+        self.assertIn('ingredients', errors[6])
+        self.assertIn('cooking_time', errors[7])
+        self.assertIn('author', errors[8])
+        self.assertIn('image', errors[9])
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.author, self.admin)
+        self.assertEqual(list(recipe.tags.all()), self.tags[:1])
+
+    def test_csv(self):
+        result = self.upload('recipes.csv', (
+            'name,text,cooking_time,image,tags,ingredients\n'
+            f'Оладьи,Описание,15,"{png_data()}","breakfast,lunch",'
+            '"мука, г: 150; молоко: 300"\n'
+            'Без ингредиентов,Описание,15,,breakfast,\n'))
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['line'] for error in result['errors']], [3])
+        recipe = Recipe.objects.get()
+        self.assertEqual(
+            sorted(recipe.recipes.values_list('ingredient__name', 'amount')),
+            [('молоко', 300), ('мука', 150)])
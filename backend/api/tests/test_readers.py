@@ -0,0 +1,178 @@
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            Shopping_cart, Tag)
+from users.models import Subscribe, User
+
+from api.registry import registry
+
+from .base import TEST_CACHES, clear_caches, png_data
+
+READERS = ('compiled', 'serializer')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RecipeReaderParityTests(TestCase):
+    """Компилированный читатель отвечает так же, как RecipeReadSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com',
+                password='password', first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}')
+            for number in range(3)
+        ]
+        cls.reader, author, other_author = cls.users
+        tags = [Tag.objects.create(name=name, slug=slug, color=color)
+                for name, slug, color in (('Завтрак', 'breakfast', '#E26C2D'),
+                                          ('Обед', 'lunch', '#49B64E'),
+                                          ('Ужин', 'dinner', '#8775D2'))]
+        ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('мука', 'г'), ('молоко', 'мл'),
+                               ('яйца', 'шт'), ('соль', 'по вкусу'))
+        ]
+        cls.recipes = []
+        for number in range(8):
+            recipe = Recipe.objects.create(
+                author=author if number % 3 else other_author,
+                name=f'Рецепт {number}', text=f'Описание {number}',
+                image=f'recipes/test{number}.png', cooking_time=number + 1)
+            recipe.tags.set(tags[number % 3:number % 3 + 2])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                                   amount=10 * (number + 1) + position)
+                for position, ingredient
+                in enumerate(ingredients[number % 4:]))
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.reader, recipe=recipe)
+        for recipe in cls.recipes[1::3]:
+            Shopping_cart.objects.create(user=cls.reader, recipe=recipe)
+        Subscribe.objects.create(user=cls.reader, author=author)
+
+    def setUp(self):
+        registry.invalidate()
+
+    def assert_same_output(self, url, user=None):
+        """Ответы обоих читателей на ``url`` совпадают; возвращает ответ."""
+        responses = {}
+        for reader in READERS:
+            clear_caches()
+            client = APIClient()
+            if user is not None:
+                client.force_authenticate(user)
+            with override_settings(RECIPE_READER=reader):
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            responses[reader] = response.json()
+        self.assertEqual(responses['compiled'], responses['serializer'], url)
+        return responses['compiled']
+
+    def check_urls(self, urls):
+        for user in (None, self.reader):
+            for url in urls:
+                with self.subTest(url=url, user=user):
+                    self.assert_same_output(url, user)
+
+    def test_list(self):
+        self.check_urls((
+            '/api/recipes/',
+            '/api/recipes/?limit=3&page=2',
+            '/api/recipes/?fields=name,tags,author&expand=tags',
+            '/api/recipes/?fields=name,author',
+            '/api/recipes/?fields=ingredients,is_favorited&expand=author',
+        ))
+
+    def test_filtered_list(self):
+        self.check_urls((
+            '/api/recipes/?tags=lunch&tags=dinner',
+            f'/api/recipes/?author={self.users[1].pk}',
+            '/api/recipes/?is_favorited=1',
+            '/api/recipes/?is_in_shopping_cart=1',
+        ))
+
+    def test_detail(self):
+        self.check_urls([f'/api/recipes/{recipe.pk}/'
+                         for recipe in self.recipes[:4]])
+
+    def test_batch(self):
+        ids = ','.join(str(recipe.pk) for recipe in self.recipes[::-1])
+        self.check_urls((f'/api/recipes/batch/?ids={ids},999999',))
+
+    def test_partial_projection_reads_only_needed_parts(self):
+        clear_caches()
+        with override_settings(RECIPE_READER='compiled'), \
+                CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/api/recipes/?fields=name,author')
+        self.assertEqual(response.status_code, 200)
+        tables = (Recipe.tags.through._meta.db_table,
+                  IngredientInRecipe._meta.db_table)
+        for query in queries:
+            for table in tables:
+                self.assertNotIn(table, query['sql'])
+        with override_settings(RECIPE_READER='compiled'):
+            full = APIClient().get('/api/recipes/').json()
+        self.assertEqual(full, self.assert_same_output('/api/recipes/'))
+
+    def create_recipe(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        with TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media,
+                                  RECIPE_READER='compiled'):
+            response = client.post('/api/recipes/', {
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 5,
+                'image': png_data(),
+                'tags': [Tag.objects.first().pk],
+                'ingredients': [{'id': Ingredient.objects.first().pk,
+                                 'amount': 10}],
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_created_recipe_matches_detail(self):
+        created = self.create_recipe()
+        self.assertEqual(
+            created, self.assert_same_output(
+                f'/api/recipes/{created["id"]}/', self.reader))
+
+    def test_created_recipe_missing_on_read_back(self):
+        with mock.patch('api.serializers.build_recipes', return_value=[]):
+            created = self.create_recipe()
+        self.assertEqual(created['name'], 'Новый рецепт')
+        self.assertEqual(created['author']['id'], self.reader.pk)
+
+    def test_author_edit_reaches_cached_recipe(self):
+        url = f'/api/recipes/{self.recipes[1].pk}/'
+        clear_caches()
+        client = APIClient()
+        etag = client.get(url)['ETag']
+        author = self.recipes[1].author
+        author.first_name = 'Новое имя'
+        author.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['author']['first_name'],
+                         'Новое имя')
+
+    def test_user_flags(self):
+        data = self.assert_same_output('/api/recipes/?limit=8', self.reader)
+        recipes = {recipe['id']: recipe for recipe in data['results']}
+        favorite = self.recipes[0].pk
+        in_cart = self.recipes[1].pk
+        self.assertTrue(recipes[favorite]['is_favorited'])
+        self.assertTrue(recipes[in_cart]['is_in_shopping_cart'])
+        self.assertTrue(recipes[in_cart]['author']['is_subscribed'])
+        self.assertFalse(recipes[favorite]['author']['is_subscribed'])
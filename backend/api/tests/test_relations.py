@@ -0,0 +1,77 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Shopping_cart
+from users.models import Subscribe
+
+from .base import TEST_CACHES, make_recipe, make_user
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RelationCreateTests(TestCase):
+    """Повторное добавление в избранное, корзину и подписки - 400, не 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('reader')
+        cls.author = make_user('author')
+        cls.recipe = make_recipe(cls.author, 'Рецепт')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def check_recipe_relation(self, url, model, error_key):
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['id'], self.recipe.pk)
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(error_key, response.json())
+        self.assertEqual(
+            model.objects.filter(user=self.user, recipe=self.recipe).count(),
+            1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+    def test_favorite(self):
+        self.check_recipe_relation(
+            f'/api/recipes/{self.recipe.pk}/favorite/', Favorite, 'favorite')
+
+    def test_shopping_cart(self):
+        self.check_recipe_relation(
+            f'/api/recipes/{self.recipe.pk}/shopping_cart/', Shopping_cart,
+            'shopping_cart')
+
+    def test_missing_recipe(self):
+        response = self.client.post('/api/recipes/999999/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recipe', response.json())
+
+    def test_existing_row_from_concurrent_request(self):
+        # Строку уже вставил параллельный запрос: вставка упирается
+        # в уникальность, и ответ - та же ошибка 400.
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('favorite', response.json())
+        self.assertTrue(
+            Favorite.objects.filter(user=self.user).exists())
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.author.pk}/subscribe/'
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['is_subscribed'])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.json())
+        self.assertEqual(Subscribe.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+
+    def test_subscribe_to_self(self):
+        response = self.client.post(f'/api/users/{self.user.pk}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Subscribe.objects.exists())
@@ -0,0 +1,106 @@
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.registry import registry
+from api.shopping import cart_state, shopping_cart_totals, stored_list
+from recipes.models import Ingredient, Shopping_cart, UnitConversion
+
+from .base import TEST_CACHES, clear_caches, make_recipe, make_user
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@override_settings(CACHES=TEST_CACHES, SHOPPING_LIST_ASYNC=False)
+class ShoppingListFileTests(TestCase):
+    """Файл списка покупок пересоздаётся, если его успели удалить."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer')
+        flour = Ingredient.objects.create(name='мука', measurement_unit='г')
+        recipe = make_recipe(cls.user, 'Блины', ingredients=[(flour, 200)])
+        Shopping_cart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        clear_caches()
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self):
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        response.close()
+        self.assertIn('мука - 200 г.', content)
+
+    def test_deleted_file_is_regenerated(self):
+        self.download()
+        default_storage.delete(stored_list(self.user.pk,
+                                           cart_state(self.user)))
+        self.download()
+
+    def test_file_removed_just_before_open(self):
+        self.download()
+        open_file = default_storage.open
+        removed = []
+
+        def remove_then_open(name, *args, **kwargs):
+            if not removed:
+                removed.append(name)
+                default_storage.delete(name)
+            return open_file(name, *args, **kwargs)
+
+        with mock.patch.object(default_storage, 'open',
+                               side_effect=remove_then_open):
+            self.download()
+        self.assertTrue(default_storage.exists(removed[0]))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ShoppingTotalsTests(TestCase):
+    """Суммы корзины в базовых единицах измерения."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('buyer')
+        grams, kilograms, pinch, liters = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('мука', 'г'), ('мука', 'кг'),
+                               ('соль', 'щепотка'), ('молоко', 'л')))
+        recipes = [
+            make_recipe(cls.user, 'Блины',
+                        ingredients=[(grams, 200), (kilograms, 1),
+                                     (pinch, 1), (liters, 30000)]),
+            make_recipe(cls.user, 'Оладьи',
+                        ingredients=[(kilograms, 2), (pinch, 2)]),
+        ]
+        for recipe in recipes:
+            Shopping_cart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        clear_caches()
+        registry.invalidate()
+
+    def test_units_are_summed_in_base_units(self):
+        self.assertEqual(list(shopping_cart_totals(self.user)), [
+            ('молоко', 30000000, 'мл'),
+            ('мука', 3200, 'г'),
+            ('соль', 3, 'щепотка'),
+        ])
+
+    def test_conversion_edit_changes_cart_state(self):
+        state = cart_state(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            UnitConversion.objects.create(unit='щепотка', base_unit='г',
+                                          factor=1)
+        self.assertNotEqual(cart_state(self.user), state)
+        self.assertIn(('соль', 3, 'г'), list(shopping_cart_totals(self.user)))
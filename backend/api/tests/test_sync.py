@@ -0,0 +1,89 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.changes import collect, horizon, log_change
+from recipes.models import Change, Favorite
+
+from .base import TEST_CACHES, make_recipe, make_user
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SyncTests(TestCase):
+    """Журнал изменений и ``/api/sync/``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('reader')
+        cls.other = make_user('other')
+        cls.author = make_user('author')
+        cls.recipes = [make_recipe(cls.author, f'Рецепт {number}')
+                       for number in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, since=0, **params):
+        response = self.client.get('/api/sync/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_tokens_follow_changes(self):
+        token = self.sync()['token']
+        self.assertEqual(token, horizon())
+        recipe = self.recipes[0]
+        self.client.post(f'/api/recipes/{recipe.pk}/favorite/')
+        data = self.sync(token)
+        self.assertEqual(
+            [(change['kind'], change['object_id'], change['deleted'])
+             for change in data['results']],
+            [(Change.FAVORITE, recipe.pk, False)])
+        self.assertGreater(data['token'], token)
+        self.assertEqual(self.sync(data['token'])['results'], [])
+
+        self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        changes = self.sync(token)['results']
+        self.assertEqual(len(changes), 1)
+        self.assertTrue(changes[0]['deleted'])
+        self.assertGreater(changes[0]['id'], data['token'])
+
+    def test_pages_are_ordered(self):
+        for recipe in self.recipes:
+            Favorite.objects.create(user=self.user, recipe=recipe)
+        ids = []
+        token = 0
+        while True:
+            data = self.sync(token, limit=2)
+            ids.extend(change['id'] for change in data['results'])
+            token = data['token']
+            if data['next'] is None:
+                break
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(token, horizon())
+
+    def test_other_users_changes_are_hidden(self):
+        Favorite.objects.create(user=self.other, recipe=self.recipes[0])
+        kinds = {change['kind'] for change in self.sync()['results']}
+        self.assertNotIn(Change.FAVORITE, kinds)
+
+    def test_collect_writes_once_at_the_end(self):
+        last = horizon()
+        with collect():
+            log_change(Change.RECIPE, self.recipes[0].pk)
+            log_change(Change.RECIPE, self.recipes[0].pk, deleted=True)
+            self.assertEqual(horizon(), last)
+        changes = Change.objects.filter(id__gt=last)
+        self.assertEqual(
+            list(changes.values_list('object_id', 'deleted')),
+            [(self.recipes[0].pk, True)])
+
+    def test_collect_rolls_back_with_the_data(self):
+        last = horizon()
+        with self.assertRaises(ValueError):
+            with collect():
+                Favorite.objects.create(user=self.user,
+                                        recipe=self.recipes[1])
+                raise ValueError
+        self.assertFalse(Change.objects.filter(id__gt=last).exists())
+        self.assertFalse(Favorite.objects.filter(user=self.user).exists())
@@ -0,0 +1,39 @@
+from django.test import TestCase, override_settings
+
+from api.signals import touch_recipe
+from recipes.tasks import compute_similar
+from tasks.models import Task
+
+from .base import TEST_CACHES, make_recipe, make_user
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SimilarEnqueueTests(TestCase):
+    """Пересчёт похожих рецептов ставится один раз на транзакцию."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = make_user('author')
+        cls.recipes = [make_recipe(author, f'Рецепт {number}')
+                       for number in range(3)]
+
+    def test_repeated_touches_enqueue_once(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for recipe in self.recipes:
+                touch_recipe(recipe.pk)
+                touch_recipe(recipe.pk)
+        queued = [callback for callback in callbacks
+                  if getattr(callback, 'task_key', None)
+                  == compute_similar.task_name]
+        self.assertEqual(len(queued), 1)
+
+    def test_pending_task_is_reused(self):
+        Task.objects.filter(name=compute_similar.task_name).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            touch_recipe(self.recipes[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            touch_recipe(self.recipes[1].pk)
+        self.assertEqual(
+            Task.objects.filter(name=compute_similar.task_name,
+                                status=Task.PENDING).count(),
+            1)
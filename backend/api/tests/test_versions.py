@@ -0,0 +1,36 @@
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from api.ingredient_index import ingredient_index
+from api.registry import registry
+
+from .base import TEST_CACHES
+
+
+class VersionStorageTests(TestCase):
+    """Версии реестра и индекса не теряются при вытеснении из кэша."""
+
+    def test_versions_survive_cache_culling(self):
+        with tempfile.TemporaryDirectory() as location:
+            file_caches = {**TEST_CACHES, 'default': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            }}
+            with override_settings(CACHES=file_caches):
+                registry_version = registry._current_version()
+                index_version = ingredient_index._current_version()
+                default = caches['default']
+                for number in range(default._max_entries * 2):
+                    default.set(f'filler:{number}', number)
+                self.assertEqual(registry._current_version(),
+                                 registry_version)
+                self.assertEqual(ingredient_index._current_version(),
+                                 index_version)
+
+    def test_invalidate_bumps_version(self):
+        version = registry._current_version()
+        registry.invalidate()
+        self.assertNotEqual(registry._current_version(), version)
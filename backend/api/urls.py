@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -16,13 +17,31 @@ router.register(
     views.FavoriteListViewSet,
     basename='favorite'
 )
+router.register('sync', views.SyncViewSet, basename='sync')
 router.register('tags', views.TagViewSet, basename='tags')
+router.register('tasks', views.TaskViewSet, basename='tasks')
 router.register('users', views.UserViewSet, basename='users')
 router.register('ingredients',
                 views.IngredientViewSet,
                 basename='ingredients')
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    urlpatterns += [
+        path('recipes/', async_views.recipe_list),
+        path('recipes/download_shopping_cart/',
+             async_views.download_shopping_cart),
+        path('recipes/<int:pk>/', async_views.recipe_detail),
+        path('tags/', async_views.tag_list),
+        path('tags/<int:pk>/', async_views.tag_detail),
+        path('ingredients/', async_views.ingredient_list),
+        path('ingredients/<int:pk>/', async_views.ingredient_detail),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
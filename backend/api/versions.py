@@ -0,0 +1,27 @@
+import time
+
+from django.db import transaction
+
+from recipes.models import Version
+
+
+def current(name):
+    """Версия ``name``; при первом чтении создаётся."""
+    return Version.objects.get_or_create(
+        name=name, defaults={'value': time.time_ns()})[0].value
+
+
+def bump(name):
+    """Поднимает версию ``name``, возвращает пару (прежняя, новая).
+
+    Новая версия - время изменения в наносекундах, но не меньше
+    прежней плюс один. Строка блокируется до коммита, поэтому по
+    прежней версии видно, не было ли между ними чужих изменений.
+    """
+    with transaction.atomic():
+        version, _ = Version.objects.select_for_update().get_or_create(
+            name=name, defaults={'value': 0})
+        previous = version.value
+        version.value = max(time.time_ns(), previous + 1)
+        version.save(update_fields=('value', ))
+    return previous, version.value
@@ -1,26 +1,116 @@
 from django.conf import settings
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.db.models import Count, Exists, OuterRef, Q, Value
 from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            Shopping_cart, Tag)
+from recipes.models import (Change, Favorite, Ingredient, Recipe,
+                            Shopping_cart, SimilarRecipe, Tag)
 from rest_framework import filters, mixins, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.viewsets import GenericViewSet
+from tasks.queue import enqueue
 from users.models import Subscribe, User
 
+from .cache import CachedListMixin
+from .changes import collect, horizon, log_relations
+from .conditional import ConditionalGetMixin
+from .export import aiterate, export_recipes
 from .filters import RecipeFilter
-from .pagination import PageSizeControlPagination
+from .importer import READERS, Importer
+from .ingredient_index import ingredient_index
+from .pagination import PageSizeControlPagination, UsernameCursorPagination
 from .permissions import IsAuthentificatedAndAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeReadSerializer,
+from .readers import read_in_order, read_queryset
+from .renderers import NDJSONRenderer
+from .serializers import (BulkIdsSerializer, ChangeSerializer,
+                          ExportSerializer, FavoriteSerializer,
+                          ImportFileSerializer,
+                          IngredientMatchSerializer, IngredientSerializer,
+                          RecipeBatchSerializer, RecipeCreateSerializer,
+                          RecipeMatchSerializer,
+                          RecipeShortSerializer,
                           ShoppingSerializer, SubscribeSerializer,
-                          SubscriptionsSerializer, TagSerializer)
+                          SubscriptionsSerializer, SyncSerializer,
+                          TagSerializer, TaskSerializer, get_projection,
+                          read_serializer_class)
+from .shopping import (cart_state, save_shopping_list, shopping_list_response,
+                       stored_list)
+from .singleflight import SingleFlightMixin
+from .tasks import render_shopping_list
+
+
+def task_accepted(queued, request):
+    serializer = TaskSerializer(queued, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': serializer.data['url']})
+
+
+def enqueue_shopping_list(user, state):
+    return enqueue(render_shopping_list, {'user_id': user.pk},
+                   key=f'shopping_list:{user.pk}:{state}', user=user)
+
+
+def shopping_list_file(user):
+    """Ответ с файлом списка покупок или задача, которая его создаст.
+
+    Файл пересоздаётся, только когда меняется состояние корзины. Файл
+    удаляется только при сохранении другого состояния, поэтому после
+    промаха состояние читается заново.
+    """
+    while True:
+        state = cart_state(user)
+        try:
+            return shopping_list_response(stored_list(user.pk, state)), None
+        except FileNotFoundError:
+            pass
+        if settings.SHOPPING_LIST_ASYNC:
+            return None, enqueue_shopping_list(user, state)
+        save_shopping_list(user, state)
+
+
+def bulk_relations(request, model, field, targets, invalid=()):
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    relations = model.objects.filter(
+        user=request.user, **{f'{field}_id__in': ids})
+    existing = set(relations.values_list(f'{field}_id', flat=True))
+    if request.method == 'DELETE':
+        with collect():
+            relations.delete()
+        results = [
+            {'id': pk, 'status': 'deleted' if pk in existing else 'not_found'}
+            for pk in ids
+        ]
+        return Response({'results': results})
+    found = set(targets.filter(id__in=ids).values_list('id', flat=True))
+    results = []
+    new_relations = []
+    for pk in ids:
+        if pk in invalid:
+            results.append({'id': pk, 'status': 'invalid'})
+        elif pk not in found:
+            results.append({'id': pk, 'status': 'not_found'})
+        elif pk in existing:
+            results.append({'id': pk, 'status': 'exists'})
+        else:
+            results.append({'id': pk, 'status': 'created'})
+            new_relations.append(
+                model(user=request.user, **{f'{field}_id': pk}))
+    # bulk_create не отправляет post_save, поэтому журнал пишется здесь.
+    with collect():
+        model.objects.bulk_create(new_relations, ignore_conflicts=True)
+        log_relations(model, request.user.pk,
+                      [getattr(relation, f'{field}_id')
+                       for relation in new_relations])
+    return Response({'results': results})
 
 
 class UserViewSet(UserViewSet):
@@ -32,11 +122,29 @@ class UserViewSet(UserViewSet):
             self.permission_classes = [IsAuthenticated, ]
         return super(UserViewSet, self).get_permissions()
 
+    def get_queryset(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return super().get_queryset().annotate(is_subscribed=Value(False))
+        return super().get_queryset().annotate(is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('pk'))))
+
+    def paginate_queryset(self, queryset):
+        # ?cursor= включает курсорную пагинацию по username: страницы
+        # без OFFSET и без COUNT(*) по всей таблице пользователей.
+        if self.action == 'list' and 'cursor' in self.request.query_params:
+            self._paginator = UsernameCursorPagination()
+        return super().paginate_queryset(queryset)
+
     @action(detail=False, methods=['get'],
             permission_classes=(IsAuthenticated,),
             pagination_class=PageSizeControlPagination)
     def subscriptions(self, request):
-        queryset = User.objects.filter(subscribed__user=request.user)
+        queryset = User.objects.filter(
+            subscribed__user=request.user
+        ).annotate(
+            is_subscribed=Value(True), recipes_count=Count('recipes')
+        ).order_by(*User._meta.ordering)
         page = self.paginate_queryset(queryset)
         serializer = SubscriptionsSerializer(page, many=True,
                                              context={'request': request})
@@ -53,9 +161,10 @@ class UserViewSet(UserViewSet):
         author = get_object_or_404(User, id=author_id)
 
         if request.method == 'POST':
-            data = {'user': user.id, 'author': author.id}
-            serializer = SubscribeSerializer(data=data,
-                                             context={"request": request})
+            serializer = SubscribeSerializer(
+                data={},
+                context={'request': request, 'author': author}
+            )
             serializer.is_valid(raise_exception=True)
             serializer.save()
             instance = SubscriptionsSerializer(
@@ -71,8 +180,19 @@ class UserViewSet(UserViewSet):
         return Response("Такой подписки нет",
                         status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='subscribe'
+    )
+    def subscribe_bulk(self, request):
+        return bulk_relations(request, Subscribe, 'author',
+                              User.objects.all(), invalid={request.user.id})
+
 
-class IngredientViewSet(mixins.ListModelMixin,
+class IngredientViewSet(CachedListMixin,
+                        mixins.ListModelMixin,
                         mixins.RetrieveModelMixin,
                         viewsets.GenericViewSet):
     queryset = Ingredient.objects.all()
@@ -80,17 +200,71 @@ class IngredientViewSet(mixins.ListModelMixin,
     serializer_class = IngredientSerializer
     filter_backends = (filters.SearchFilter, )
     search_fields = ('^name', )
+    cache_tag = 'ingredients'
 
 
-class TagViewSet(mixins.ListModelMixin,
+class TagViewSet(CachedListMixin,
+                 mixins.ListModelMixin,
                  mixins.RetrieveModelMixin,
                  viewsets.GenericViewSet):
     permission_classes = (AllowAny, )
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    cache_tag = 'tags'
+
+
+class TaskViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = TaskSerializer
+    permission_classes = (IsAuthenticated, )
+
+    def get_queryset(self):
+        return self.request.user.tasks.all()
+
+
+class SyncViewSet(viewsets.GenericViewSet):
+    """Изменения после токена ``since`` по возрастанию токена.
 
+    Рецепты видны всем, избранное, корзина и подписки - только своему
+    пользователю. Токен для следующего запроса - ``token`` ответа.
+    Записи отдаются не дальше ``horizon()``: все, что до него, уже
+    закоммичены.
+    """
 
-class RecipeViewSet(viewsets.ModelViewSet):
+    permission_classes = (AllowAny, )
+    serializer_class = ChangeSerializer
+
+    def get_queryset(self):
+        visible = Q(user=None)
+        if self.request.user.is_authenticated:
+            visible |= Q(user=self.request.user)
+        return Change.objects.filter(visible).only(
+            'id', 'kind', 'object_id', 'deleted', 'changed_at')
+
+    def list(self, request):
+        params = SyncSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        since = params.validated_data['since']
+        limit = params.validated_data['limit']
+        changes = list(self.get_queryset()
+                       .filter(id__gt=since, id__lte=horizon())
+                       .order_by('id')[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        token = changes[-1].pk if changes else since
+        next_url = None
+        if has_more:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'since', token)
+        return Response({
+            'token': token,
+            'next': next_url,
+            'results': self.get_serializer(changes, many=True).data,
+        })
+
+
+class RecipeViewSet(ConditionalGetMixin, SingleFlightMixin,
+                    viewsets.ModelViewSet):
+    read_actions = ('list', 'retrieve', 'batch')
     queryset = Recipe.objects.all()
     pagination_class = PageSizeControlPagination
     permission_classes = (IsAuthentificatedAndAuthorOrReadOnly, )
@@ -100,39 +274,134 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @staticmethod
     def create_object(serializer_class, pk, request):
-        data = {'user': request.user.id, 'recipe': pk}
-        serializer = serializer_class(data=data, context={'request': request})
+        serializer = serializer_class(data={'recipe': pk},
+                                      context={'request': request})
         serializer.is_valid(raise_exception=True)
         return serializer.save()
 
+    @cached_property
+    def projection(self):
+        return get_projection(self.request.query_params)
+
+    def get_queryset(self):
+        if self.action in self.read_actions:
+            return read_queryset(self.queryset, self.projection)
+        return super().get_queryset()
+
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
-            return RecipeReadSerializer
+        if self.action in self.read_actions:
+            return read_serializer_class()
         return RecipeCreateSerializer
 
-    def create_file_and_response(self, ingredients):
-        file_list = []
-        [file_list.append(
-            '{} - {} {}.'.format(*ingredient)) for ingredient in ingredients]
-        file_content = 'Cписок покупок:\n' + '\n'.join(file_list)
-        response = HttpResponse(file_content, content_type='text/plain')
-        response['Content-Disposition'] = (
-            f'attachment; filename={settings.FILE_NAME}'
-        )
-        return response
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.read_actions:
+            context['projection'] = self.projection
+        return context
 
-    @action(detail=False, methods=['get'],
+    def perform_destroy(self, instance):
+        with collect():
+            instance.delete()
+
+    @action(detail=False, methods=['get', 'post'],
             permission_classes=(IsAuthenticated,))
     def download_shopping_cart(self, request, **kwargs):
-        ingredients = (
-            IngredientInRecipe.objects
-            .filter(recipe__shopping_cart__user=request.user)
-            .values('ingredient')
-            .annotate(total_amount=Sum('amount'))
-            .values_list('ingredient__name', 'total_amount',
-                         'ingredient__measurement_unit')
-        )
-        return self.create_file_and_response(ingredients)
+        if request.method == 'POST':
+            return task_accepted(enqueue_shopping_list(
+                request.user, cart_state(request.user)), request)
+        response, queued = shopping_list_file(request.user)
+        if queued is not None:
+            return task_accepted(queued, request)
+        return response
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=(IsAuthenticated,),
+            url_path='shopping_cart')
+    def shopping_cart_bulk(self, request):
+        return bulk_relations(request, Shopping_cart, 'recipe',
+                              Recipe.objects.all())
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=(IsAuthenticated,),
+            url_path='favorite')
+    def favorite_bulk(self, request):
+        return bulk_relations(request, Favorite, 'recipe',
+                              Recipe.objects.all())
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(AllowAny,))
+    def batch(self, request):
+        params = RecipeBatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        recipes, missing = read_in_order(
+            self.get_queryset(),
+            list(dict.fromkeys(params.validated_data['ids'])))
+        serializer = self.get_serializer(recipes, many=True)
+        return Response({'results': serializer.data, 'missing': missing})
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(NDJSONRenderer,))
+    def export(self, request):
+        params = ExportSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        renderer = NDJSONRenderer()
+        lines = map(renderer.render, export_recipes(
+            params.validated_data['after'], request=request))
+        if settings.ASYNC_VIEWS:
+            lines = aiterate(lines)
+        return StreamingHttpResponse(lines,
+                                     content_type=renderer.media_type)
+
+    @action(detail=False, methods=['post'],
+            permission_classes=(IsAdminUser,),
+            parser_classes=(MultiPartParser,),
+            url_path='import', url_name='import')
+    def import_recipes(self, request):
+        params = ImportFileSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        upload = params.validated_data['file']
+        reader = READERS['csv' if upload.name.lower().endswith('.csv')
+                         else 'ndjson']
+        lines = (line.decode('utf-8-sig', 'replace') for line in upload)
+        return Response(
+            Importer(default_author=request.user).run(reader(lines)))
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(AllowAny,))
+    def match(self, request):
+        params = IngredientMatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ranked = ingredient_index.match(
+            params.validated_data['ingredients'])
+        page = self.paginate_queryset(ranked)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _, _ in page])
+        matches = []
+        for recipe_id, matched, total in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched = matched
+            recipe.total = total
+            recipe.coverage = round(matched / total, 4)
+            matches.append(recipe)
+        serializer = RecipeMatchSerializer(matches, many=True,
+                                           context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'],
+            permission_classes=(AllowAny,))
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        neighbors = (SimilarRecipe.objects
+                     .filter(recipe=recipe)
+                     .select_related('similar')
+                     .order_by('-score'))
+        serializer = RecipeShortSerializer(
+            [neighbor.similar for neighbor in neighbors],
+            many=True, context={'request': request})
+        return Response(serializer.data)
 
 
 class ShoppingListViewSet(DestroyModelMixin, CreateModelMixin, GenericViewSet):
@@ -141,19 +410,20 @@ class ShoppingListViewSet(DestroyModelMixin, CreateModelMixin, GenericViewSet):
     serializer_class = ShoppingSerializer
 
     def create(self, request, *args, **kwargs):
-        data = {'user': request.user.id, 'recipe': self.kwargs.get('id')}
-        serializer = ShoppingSerializer(data=data)
+        serializer = ShoppingSerializer(
+            data={'recipe': self.kwargs.get('id')},
+            context={'request': request}
+        )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, *args, **kwargs):
-        obj = Shopping_cart.objects.filter(
+        deleted, _ = Shopping_cart.objects.filter(
             user_id=request.user.id,
             recipe_id=self.kwargs.get('id')
-        )
-        if obj:
-            obj.delete()
+        ).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response("Такого рецепта нет в корзине",
                         status=status.HTTP_400_BAD_REQUEST)
@@ -165,19 +435,20 @@ class FavoriteListViewSet(DestroyModelMixin, CreateModelMixin, GenericViewSet):
     serializer_class = FavoriteSerializer
 
     def create(self, request, *args, **kwargs):
-        data = {'user': request.user.id, 'recipe': self.kwargs.get('id')}
-        serializer = FavoriteSerializer(data=data)
+        serializer = FavoriteSerializer(
+            data={'recipe': self.kwargs.get('id')},
+            context={'request': request}
+        )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, *args, **kwargs):
-        obj = Favorite.objects.filter(
+        deleted, _ = Favorite.objects.filter(
             user_id=request.user.id,
             recipe_id=self.kwargs.get('id')
-        )
-        if obj:
-            obj.delete()
+        ).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response("Такого рецепта нет в избранном",
                         status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,22 @@
+from django.contrib import admin
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.contrib.admin.checks import check_admin_app, check_dependencies
+from django.core import checks
+
+
+def check_admin_sites(app_configs, **kwargs):
+    """Проверки админки после загрузки admin.py всех приложений."""
+    admin.autodiscover()
+    return check_admin_app(app_configs, **kwargs)
+
+
+class AdminConfig(SimpleAdminConfig):
+    """Админка без autodiscover при старте воркера.
+
+    Модули admin.py загружаются при первом обращении к /admin/,
+    а ``manage.py check`` загружает их сам и проверяет ModelAdmin.
+    """
+
+    def ready(self):
+        checks.register(check_dependencies, checks.Tags.admin)
+        checks.register(check_admin_sites, checks.Tags.admin)
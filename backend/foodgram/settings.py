@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -36,7 +37,7 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', "*").split(',')
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    'foodgram.apps.AdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'tasks.apps.TasksConfig',
 ]
 
 MIDDLEWARE = [
@@ -59,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -81,6 +84,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+ASYNC_VIEWS = os.getenv('SERVER_MODE') == 'asgi'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -104,6 +111,33 @@ else:
         }
     }
 
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'foodgram_cache'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_LOCATION,
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_LOCATION, 'api'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'flights': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_LOCATION, 'flights'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+if os.getenv('API_CACHE_BACKEND') == 'db':
+    CACHES['api'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -171,6 +205,15 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
@@ -181,9 +224,60 @@ REST_FRAMEWORK = {
 AUTH_USER_MODEL = 'users.User'
 
 FILE_NAME = 'shopping_cart.txt'
+SHOPPING_LIST_ASYNC = os.getenv('SHOPPING_LIST_ASYNC') == 'True'
+SHOPPING_LIST_X_ACCEL = os.getenv('SHOPPING_LIST_X_ACCEL') == 'True'
 
 LINE_LIMIT_EMAIL = 254
 LINE_LIMIT_RECIPES = 200
 LINE_LIMIT_USERS = 150
 
 PAGE_SIZE = 6
+
+RECIPE_READER = os.getenv('RECIPE_READER', 'compiled')
+
+INGREDIENT_INDEX_CHECK_INTERVAL = int(
+    os.getenv('INGREDIENT_INDEX_CHECK_INTERVAL', 30))
+INGREDIENT_MATCH_LIMIT = 100
+
+REGISTRY_CHECK_INTERVAL = int(os.getenv('REGISTRY_CHECK_INTERVAL', 5))
+
+SINGLE_FLIGHT_CACHE_ALIAS = 'flights'
+SINGLE_FLIGHT_TIMEOUT = 60
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+SINGLE_FLIGHT_POLL = 0.05
+SINGLE_FLIGHT_BETA = 1.0
+SINGLE_FLIGHT_LOCK_DIR = os.path.join(CACHE_LOCATION, 'locks')
+SINGLE_FLIGHT_LOCK_SLOTS = 1024
+
+API_CACHE_ALIAS = 'api'
+API_CACHE_TIMEOUT = 3600
+API_CACHE_L1_SIZE = 1000
+API_CACHE_L1_TIMEOUT = 30
+API_CACHE_TAG_CHECK_INTERVAL = int(
+    os.getenv('API_CACHE_TAG_CHECK_INTERVAL', 5))
+API_CACHE_STATS_INTERVAL = 10
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_DIR = os.getenv(
+    'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'foodgram_profiles'))
+PROFILE_KEEP = 200
+PROFILE_TOP = 30
+
+SIMILAR_RECIPES_COUNT = 6
+
+BULK_LIMIT = 500
+
+RECIPE_BATCH_LIMIT = 100
+
+SYNC_LIMIT = 500
+
+EXPORT_CHUNK_SIZE = 500
+
+IMPORT_CHUNK_SIZE = 200
+IMPORT_THREADS = 4
+
+TASK_BROKER = os.getenv('TASK_BROKER', 'database')
+TASK_THREADS = 2
+TASK_LEASE = 300
+TASK_RETRY_DELAY = 5
@@ -1,7 +1,8 @@
-from django.contrib import admin
 from django.urls import path, include
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # Строка вместо модуля: админка и admin.py приложений загружаются
+    # при первом обращении к /admin/, а не при старте воркера.
+    path('admin/', ('foodgram.admin_urls', 'admin', 'admin')),
     path('api/', include('api.urls')),
 ]
@@ -0,0 +1,133 @@
+"""Настройки gunicorn: gunicorn --config gunicorn.conf.py.
+
+Число воркеров и потоков считается по лимитам контейнера (cgroup v1 и
+v2), класс воркера выбирается переменными окружения:
+
+    SERVER_MODE             wsgi или asgi (воркеры uvicorn)
+    GUNICORN_WORKER_CLASS   sync, gthread или uvicorn, важнее SERVER_MODE
+    GUNICORN_WORKERS        число воркеров вместо расчётного
+    GUNICORN_THREADS        потоков в воркере gthread, по умолчанию 4
+    GUNICORN_WORKER_MEMORY  память на воркер в МБ для расчёта, 160
+    GUNICORN_SLOW_REQUEST   порог медленного запроса в мс, 500
+
+Медленные запросы с числом обращений к БД пишутся в лог хуками
+pre_request и post_request; воркеры uvicorn эти хуки не вызывают.
+"""
+import math
+import os
+import time
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+
+def read_cgroup(*paths):
+    for path in paths:
+        try:
+            with open(path) as file:
+                return file.read().split()
+        except OSError:
+            continue
+    return None
+
+
+def cpu_limit():
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    quota = read_cgroup('/sys/fs/cgroup/cpu.max') or (
+        (read_cgroup('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') or [])
+        + (read_cgroup('/sys/fs/cgroup/cpu/cpu.cfs_period_us') or []))
+    if len(quota) == 2 and quota[0] not in ('max', '-1'):
+        cpus = min(cpus, math.ceil(int(quota[0]) / int(quota[1])))
+    return max(cpus, 1)
+
+
+def memory_limit():
+    limit = read_cgroup('/sys/fs/cgroup/memory.max',
+                        '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+    if not limit or limit[0] == 'max' or int(limit[0]) >= 2 ** 60:
+        return None
+    return int(limit[0])
+
+
+def worker_count(worker_class, cpus, memory):
+    if os.getenv('GUNICORN_WORKERS'):
+        return int(os.getenv('GUNICORN_WORKERS'))
+    # Потоки gthread и цикл событий uvicorn сами дают параллелизм
+    # по вводу-выводу, поэтому им хватает воркера на ядро.
+    workers = 2 * cpus + 1 if worker_class == 'sync' else cpus + 1
+    if memory is not None:
+        budget = int(os.getenv('GUNICORN_WORKER_MEMORY', 160)) * 2 ** 20
+        workers = min(workers, memory // budget)
+    return max(workers, 1)
+
+
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+worker_type = os.getenv(
+    'GUNICORN_WORKER_CLASS', 'uvicorn' if server_mode == 'asgi' else 'sync')
+
+wsgi_app = ('foodgram.asgi:application' if worker_type == 'uvicorn'
+            else 'foodgram.wsgi:application')
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = WORKER_CLASSES[worker_type]
+workers = worker_count(worker_type, cpu_limit(), memory_limit())
+threads = 1
+if worker_type == 'gthread':
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+# Соединение с nginx переживает паузу между запросами одной страницы.
+keepalive = 5
+max_requests = 1000
+max_requests_jitter = 100
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+slow_request = int(os.getenv('GUNICORN_SLOW_REQUEST', 500)) / 1000
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+def pre_request(worker, req):
+    from django.db import connection
+
+    req.started = time.perf_counter()
+    req.queries = QueryCounter()
+    connection.execute_wrappers.append(req.queries)
+
+
+def post_request(worker, req, environ, resp):
+    from django.db import connection
+
+    queries = getattr(req, 'queries', None)
+    if queries is None:
+        return
+    if queries in connection.execute_wrappers:
+        connection.execute_wrappers.remove(queries)
+    duration = time.perf_counter() - req.started
+    if duration >= slow_request:
+        worker.log.warning(
+            'Медленный запрос: %s %s -> %s за %.0f мс, '
+            'запросов к БД %d (%.0f мс)',
+            req.method, req.uri, getattr(resp, 'status', None),
+            duration * 1000,
+            queries.count, queries.duration * 1000)
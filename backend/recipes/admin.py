@@ -1,13 +1,17 @@
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 from . import models
+from .admin_filters import AuthorFilter, RecipeNameFilter, UserFilter
 
 
 @admin.register(models.Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'name', 'measurement_unit')
-    list_filter = ('name', )
-    search_fields = ('name', )
+    list_filter = ('measurement_unit', )
+    search_fields = ('^name', )
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
@@ -18,20 +22,76 @@ class TagAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+@admin.register(models.UnitConversion)
+class UnitConversionAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'unit', 'factor', 'base_unit')
+    search_fields = ('unit', 'base_unit')
+    empty_value_display = '-пусто-'
+
+
+class IngredientInRecipeInline(admin.TabularInline):
+    model = models.IngredientInRecipe
+    autocomplete_fields = ('ingredient', )
+    extra = 0
+    min_num = 1
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient')
+
+
 @admin.register(models.Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author')
-    list_filter = ('name', 'author', 'tags')
+    list_display = ('pk', 'name', 'author', 'favorites_count')
+    list_filter = (AuthorFilter, 'tags')
+    list_select_related = ('author', )
+    search_fields = ('name', )
+    autocomplete_fields = ('author', )
+    readonly_fields = ('favorites_count', )
+    inlines = (IngredientInRecipeInline, )
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        favorites = (
+            models.Favorite.objects.filter(recipe=OuterRef('pk'))
+            .order_by().values('recipe').annotate(count=Count('id'))
+            .values('count')
+        )
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites, output_field=IntegerField()), 0))
 
-@admin.register(models.Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+    @admin.display(description='в избранном',
+                   ordering='favorites_count')
+    def favorites_count(self, obj):
+        return obj.favorites_count
+
+
+class UserRecipeAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe')
-    list_editable = ('user', 'recipe')
+    list_filter = (UserFilter, RecipeNameFilter)
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
+
+
+@admin.register(models.Favorite)
+class FavoriteAdmin(UserRecipeAdmin):
+    pass
 
 
 @admin.register(models.Shopping_cart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'user', 'recipe')
-    list_editable = ('user', 'recipe')
+class ShoppingCartAdmin(UserRecipeAdmin):
+    pass
+
+
+@admin.register(models.Change)
+class ChangeAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'kind', 'object_id', 'user', 'deleted',
+                    'changed_at')
+    list_filter = ('kind', 'deleted')
+    list_select_related = ('user', )
+    raw_id_fields = ('user', )
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
@@ -0,0 +1,46 @@
+from django.contrib import admin
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех значений.
+
+    Боковая панель не загружает варианты из БД, поэтому фильтры по
+    пользователям и рецептам не зависят от размера таблиц.
+    """
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.lookup: self.value().strip()})
+        return queryset
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (name, value)
+            for name, value in changelist.get_filters_params().items()
+            if name != self.parameter_name
+        )
+        yield all_choice
+
+
+class UserFilter(InputFilter):
+    title = 'пользователю'
+    parameter_name = 'username'
+    lookup = 'user__username__iexact'
+
+
+class AuthorFilter(InputFilter):
+    title = 'автору'
+    parameter_name = 'author'
+    lookup = 'author__username__iexact'
+
+
+class RecipeNameFilter(InputFilter):
+    title = 'рецепту'
+    parameter_name = 'recipe'
+    lookup = 'recipe__name__istartswith'
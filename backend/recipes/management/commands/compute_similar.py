@@ -0,0 +1,164 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+from scipy import sparse
+
+from recipes.models import IngredientInRecipe, Recipe, SimilarRecipe
+
+
+def recipe_features(recipe_ids):
+    """Бинарная матрица признаков «рецепт x (ингредиенты + теги)».
+
+    Строки нормированы, поэтому произведение строк - косинусное сходство.
+    """
+    rows = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+    pairs = [
+        (rows[recipe_id], ('i', ingredient_id))
+        for recipe_id, ingredient_id in IngredientInRecipe.objects
+        .values_list('recipe_id', 'ingredient_id').iterator()
+        if recipe_id in rows
+    ]
+    pairs += [
+        (rows[recipe_id], ('t', tag_id))
+        for recipe_id, tag_id in Recipe.tags.through.objects
+        .values_list('recipe_id', 'tag_id').iterator()
+        if recipe_id in rows
+    ]
+    columns = {}
+    row_idx = np.fromiter((row for row, _ in pairs), dtype=np.int32,
+                          count=len(pairs))
+    col_idx = np.fromiter(
+        (columns.setdefault(feature, len(columns)) for _, feature in pairs),
+        dtype=np.int32, count=len(pairs))
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (row_idx, col_idx)),
+        shape=(len(recipe_ids), max(len(columns), 1)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms) @ matrix
+
+
+def top_neighbors(similarity, row, own_column, top):
+    start, end = similarity.indptr[row], similarity.indptr[row + 1]
+    columns = similarity.indices[start:end]
+    scores = similarity.data[start:end]
+    keep = (columns != own_column) & (scores > 0)
+    columns, scores = columns[keep], scores[keep]
+    # При равном сходстве - меньший id, чтобы результат не зависел от
+    # состава пачки и инкрементальный расчёт совпадал с полным.
+    order = np.lexsort((columns, -scores))[:top]
+    return columns[order], scores[order]
+
+
+class Command(BaseCommand):
+    help = "Compute similar recipes by shared ingredients and tags"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать соседей для всех рецептов.')
+        parser.add_argument(
+            '--top', type=int, default=settings.SIMILAR_RECIPES_COUNT)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def targets(self, full, recipe_ids, stale):
+        if full:
+            return list(recipe_ids)
+        if not stale:
+            return []
+        referencing = set(SimilarRecipe.objects.filter(similar_id__in=stale)
+                          .values_list('recipe_id', flat=True))
+        return sorted(referencing | stale.keys())
+
+    def beaten(self, candidates, top):
+        """Рецепты, в чьих соседей теперь должен войти изменённый.
+
+        ``candidates`` - лучшее сходство рецепта с изменёнными; оно
+        сравнивается с худшим из сохранённых соседей.
+        """
+        lowest = {
+            row['recipe_id']: row for row in SimilarRecipe.objects
+            .filter(recipe_id__in=candidates).values('recipe_id')
+            .annotate(count=Count('id'), score=Min('score'))
+        }
+        return sorted(
+            recipe_id for recipe_id, score in candidates.items()
+            if recipe_id not in lowest or lowest[recipe_id]['count'] < top
+            or score >= lowest[recipe_id]['score'])
+
+    def compute(self, targets, stale, recipe_ids, features, top,
+                batch_size):
+        """Пересчитывает соседей ``targets``.
+
+        Возвращает лучшее сходство с изменёнными рецептами для
+        рецептов вне ``targets``. Флаг ``similar_stale`` снимается
+        только с тех, чей ``updated_at`` не менялся с начала расчёта:
+        правки во время расчёта останутся на следующий запуск.
+        """
+        rows = {recipe_id: row for row, recipe_id in enumerate(recipe_ids)}
+        features_t = features.T.tocsr()
+        targeted = set(targets)
+        candidates = {}
+        for start in range(0, len(targets), batch_size):
+            batch = [recipe_id for recipe_id in
+                     targets[start:start + batch_size] if recipe_id in rows]
+            similarity = (features[[rows[recipe_id] for recipe_id in batch]]
+                          @ features_t).tocsr()
+            neighbors = []
+            for offset, recipe_id in enumerate(batch):
+                columns, scores = top_neighbors(
+                    similarity, offset, rows[recipe_id], top)
+                neighbors += [
+                    SimilarRecipe(recipe_id=recipe_id,
+                                  similar_id=recipe_ids[column],
+                                  score=round(float(score), 6))
+                    for column, score in zip(columns, scores)
+                ]
+                if recipe_id not in stale:
+                    continue
+                row_start = similarity.indptr[offset]
+                row_end = similarity.indptr[offset + 1]
+                for column, score in zip(
+                        similarity.indices[row_start:row_end],
+                        similarity.data[row_start:row_end]):
+                    other_id = recipe_ids[column]
+                    if other_id not in targeted and score > 0:
+                        candidates[other_id] = max(
+                            candidates.get(other_id, 0),
+                            round(float(score), 6))
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+                SimilarRecipe.objects.bulk_create(neighbors)
+                for recipe_id in batch:
+                    if recipe_id in stale:
+                        Recipe.objects.filter(
+                            id=recipe_id, updated_at=stale[recipe_id]
+                        ).update(similar_stale=False)
+        return candidates
+
+    def handle(self, *args, **options):
+        # Версии изменённых рецептов читаются до признаков: всё, что
+        # закоммичено позже, получит другой updated_at.
+        stale = dict(Recipe.objects.filter(similar_stale=True)
+                     .values_list('id', 'updated_at'))
+        recipe_ids = list(Recipe.objects.order_by('id')
+                          .values_list('id', flat=True))
+        targets = self.targets(options['full'], recipe_ids, stale)
+        if not targets:
+            self.stdout.write("[!] Similar recipes are up to date.")
+            return
+        features = recipe_features(recipe_ids)
+        top = options['top']
+        candidates = self.compute(targets, stale, recipe_ids, features, top,
+                                  options['batch_size'])
+        beaten = self.beaten(candidates, top)
+        if beaten:
+            self.compute(beaten, {}, recipe_ids, features, top,
+                         options['batch_size'])
+        self.stdout.write(
+            "[!] Similar recipes computed for "
+            f"{len(targets) + len(beaten)} recipes.")
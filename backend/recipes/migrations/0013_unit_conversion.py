@@ -0,0 +1,27 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:28
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitConversion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit', models.CharField(max_length=200, unique=True, verbose_name='еденица измерения')),
+                ('base_unit', models.CharField(max_length=200, verbose_name='базовая еденица')),
+                ('factor', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)], verbose_name='множитель')),
+            ],
+            options={
+                'verbose_name': 'Перевод единиц',
+                'ordering': ('base_unit', 'factor'),
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+CONVERSIONS = (
+    ('кг', 'г', 1000),
+    ('л', 'мл', 1000),
+)
+
+
+def load_conversions(apps, schema_editor):
+    UnitConversion = apps.get_model('recipes', 'UnitConversion')
+    UnitConversion.objects.bulk_create(
+        UnitConversion(unit=unit, base_unit=base_unit, factor=factor)
+        for unit, base_unit, factor in CONVERSIONS
+    )
+
+
+def remove_conversions(apps, schema_editor):
+    UnitConversion = apps.get_model('recipes', 'UnitConversion')
+    UnitConversion.objects.filter(
+        unit__in=[unit for unit, _, _ in CONVERSIONS]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_unit_conversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_conversions, remove_conversions),
+    ]
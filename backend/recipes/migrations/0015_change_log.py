@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0014_load_unit_conversions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'рецепт'), ('favorite', 'избранное'), ('shopping_cart', 'корзина'), ('subscription', 'подписка')], max_length=20, verbose_name='объект')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='id объекта')),
+                ('deleted', models.BooleanField(default=False, verbose_name='удалён')),
+                ('changed_at', models.DateTimeField(auto_now=True, verbose_name='время изменения')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['user', 'id'], name='change_user_idx'), models.Index(fields=['kind', 'object_id', 'user'], name='change_object_idx')],
+            },
+        ),
+    ]
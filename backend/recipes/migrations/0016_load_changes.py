@@ -0,0 +1,41 @@
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def load_changes(apps, schema_editor):
+    Change = apps.get_model('recipes', 'Change')
+    sources = (
+        ('recipe', apps.get_model('recipes', 'Recipe'), None, 'id'),
+        ('favorite', apps.get_model('recipes', 'Favorite'),
+         'user_id', 'recipe_id'),
+        ('shopping_cart', apps.get_model('recipes', 'Shopping_cart'),
+         'user_id', 'recipe_id'),
+        ('subscription', apps.get_model('users', 'Subscribe'),
+         'user_id', 'author_id'),
+    )
+    for kind, model, user_field, object_field in sources:
+        fields = [object_field] + ([user_field] if user_field else [])
+        Change.objects.bulk_create(
+            (Change(kind=kind, object_id=row[0],
+                    user_id=row[1] if user_field else None)
+             for row in model.objects.order_by('id')
+             .values_list(*fields).iterator(chunk_size=BATCH_SIZE)),
+            batch_size=BATCH_SIZE
+        )
+
+
+def remove_changes(apps, schema_editor):
+    apps.get_model('recipes', 'Change').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_change_log'),
+        ('users', '0005_alter_user_first_name_alter_user_last_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_changes, remove_changes),
+    ]
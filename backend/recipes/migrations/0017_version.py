@@ -0,0 +1,23 @@
+# Generated by Django 4.2.5 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_load_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Version',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='имя')),
+                ('value', models.BigIntegerField(verbose_name='версия')),
+            ],
+            options={
+                'verbose_name': 'Версия',
+            },
+        ),
+    ]
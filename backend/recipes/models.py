@@ -60,6 +60,25 @@ class Ingredient(models.Model):
         return f'{self.name}, {self.measurement_unit}'
 
 
+class UnitConversion(models.Model):
+    unit = models.CharField(max_length=settings.LINE_LIMIT_RECIPES,
+                            unique=True,
+                            verbose_name='еденица измерения')
+    base_unit = models.CharField(max_length=settings.LINE_LIMIT_RECIPES,
+                                 verbose_name='базовая еденица')
+    factor = models.PositiveIntegerField(
+        validators=[MinValueValidator(1)],
+        verbose_name='множитель'
+    )
+
+    class Meta:
+        ordering = ('base_unit', 'factor')
+        verbose_name = 'Перевод единиц'
+
+    def __str__(self):
+        return f'1 {self.unit} = {self.factor} {self.base_unit}'
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -83,6 +102,10 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='ыремя публикации')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='время изменения')
     tags = models.ManyToManyField(Tag, verbose_name='теги')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -90,6 +113,11 @@ class Recipe(models.Model):
         through_fields=('recipe', 'ingredient'),
         verbose_name='ингредиенты'
     )
+    similar_stale = models.BooleanField(
+        default=True,
+        db_index=True,
+        verbose_name='похожие рецепты устарели'
+    )
 
     class Meta:
         ordering = ('-pub_date',)
@@ -99,6 +127,35 @@ class Recipe(models.Model):
         return self.name
 
 
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+        verbose_name='рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='сходство')
+
+    class Meta:
+        ordering = ('recipe', '-score')
+        verbose_name = 'Похожий рецепт'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}'
+
+
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe,
@@ -187,3 +244,70 @@ class Shopping_cart(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.recipe.name}'
+
+
+class Change(models.Model):
+    """Запись журнала изменений для синхронизации клиентов.
+
+    На каждый объект остаётся одна запись: при новом изменении старая
+    удаляется, а новая получает больший id, который и служит токеном.
+    Записи об избранном, корзине и подписках видны только их
+    пользователю, о рецептах - всем.
+    """
+
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTION = 'subscription'
+    KINDS = (
+        (RECIPE, 'рецепт'),
+        (FAVORITE, 'избранное'),
+        (SHOPPING_CART, 'корзина'),
+        (SUBSCRIPTION, 'подписка'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KINDS,
+                            verbose_name='объект')
+    object_id = models.PositiveBigIntegerField(verbose_name='id объекта')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='пользователь'
+    )
+    deleted = models.BooleanField(default=False, verbose_name='удалён')
+    changed_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='время изменения')
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Изменение'
+        indexes = [
+            models.Index(fields=('user', 'id'), name='change_user_idx'),
+            models.Index(fields=('kind', 'object_id', 'user'),
+                         name='change_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.pk} {self.kind} {self.object_id}'
+
+
+class Version(models.Model):
+    """Счётчик версии общих данных процессов: реестра, индексов.
+
+    Хранится в БД, а не в кэше: вытеснение записи из кэша выглядело бы
+    как изменение и заставляло бы все процессы перестраивать данные.
+    """
+
+    name = models.CharField(max_length=100, primary_key=True,
+                            verbose_name='имя')
+    value = models.BigIntegerField(verbose_name='версия')
+
+    class Meta:
+        verbose_name = 'Версия'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
@@ -0,0 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from tasks.queue import task
+
+
+@task(name='recipes.compute_similar')
+def compute_similar():
+    output = StringIO()
+    call_command('compute_similar', stdout=output)
+    return {'output': output.getvalue().strip()}
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from . import models
+
+
+@admin.register(models.Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'user',
+                    'created_at', 'updated_at')
+    list_filter = ('status', 'name')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    search_fields = ('key',)
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tasks.queue import run_ready
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти.')
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Пауза при пустой очереди, секунды.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            done = run_ready(options['batch_size'])
+            if done:
+                self.stdout.write(f'[!] Выполнено задач: {done}.')
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['sleep'])
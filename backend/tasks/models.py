@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'выполнена'),
+        (FAILED, 'ошибка'),
+    )
+
+    name = models.CharField(max_length=settings.LINE_LIMIT_RECIPES,
+                            verbose_name='задача')
+    payload = models.JSONField(default=dict, verbose_name='аргументы')
+    key = models.CharField(
+        max_length=settings.LINE_LIMIT_RECIPES,
+        null=True,
+        blank=True,
+        verbose_name='ключ идемпотентности'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='tasks',
+        verbose_name='пользователь'
+    )
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING, verbose_name='статус')
+    attempts = models.PositiveSmallIntegerField(default=0,
+                                                verbose_name='попыток')
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name='максимум попыток')
+    run_after = models.DateTimeField(default=timezone.now,
+                                     verbose_name='запустить после')
+    result = models.JSONField(null=True, blank=True,
+                              verbose_name='результат')
+    error = models.TextField(blank=True, verbose_name='ошибка')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='создана')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='изменена')
+
+    class Meta:
+        ordering = ('-created_at',)
+        verbose_name = 'Фоновая задача'
+        indexes = [
+            models.Index(fields=('status', 'run_after'),
+                         name='task_queue_idx')
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(status='pending'),
+                name='unique_pending_task_key'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}: {self.get_status_display()}'
@@ -0,0 +1,205 @@
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name=None, max_attempts=3):
+    """Регистрирует функцию как фоновую задачу.
+
+    Функция получает ``payload`` задачи именованными аргументами и
+    возвращает результат, который можно сохранить в JSON.
+    """
+    def decorator(function):
+        function.task_name = (
+            name or f'{function.__module__}.{function.__name__}')
+        function.max_attempts = max_attempts
+        TASKS[function.task_name] = function
+        return function
+    return decorator
+
+
+def enqueue(function, payload=None, key=None, user=None):
+    """Ставит задачу в очередь и возвращает её запись.
+
+    Пока задача с тем же ``key`` ждёт в очереди, повторный вызов
+    возвращает её, а не создаёт новую.
+    """
+    fields = {
+        'name': function.task_name,
+        'payload': payload or {},
+        'max_attempts': function.max_attempts,
+        'user': user,
+    }
+    if key is None:
+        queued = Task.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                queued = Task.objects.create(key=key, **fields)
+        except IntegrityError:
+            return Task.objects.filter(key=key).order_by('-pk').first()
+    get_broker().submit(queued.pk)
+    return queued
+
+
+def enqueue_on_commit(function, key):
+    """Ставит задачу с ``key`` после коммита текущей транзакции.
+
+    Повторные вызовы в той же транзакции ничего не добавляют.
+    """
+    pending = connection.run_on_commit if connection.in_atomic_block else ()
+    if any(getattr(callback, 'task_key', None) == key
+           for _, callback, *_ in pending):
+        return
+
+    def callback():
+        enqueue(function, key=key)
+    callback.task_key = key
+    transaction.on_commit(callback)
+
+
+def ready_tasks():
+    """Задачи, которые можно забрать.
+
+    ``RUNNING`` с истёкшим ``run_after`` - задача упавшего воркера:
+    при захвате ``run_after`` продлевается на ``TASK_LEASE`` секунд.
+    """
+    return Task.objects.filter(status__in=(Task.PENDING, Task.RUNNING),
+                               run_after__lte=timezone.now())
+
+
+def claim(task_id):
+    now = timezone.now()
+    claimed = ready_tasks().filter(pk=task_id).update(
+        status=Task.RUNNING,
+        attempts=F('attempts') + 1,
+        run_after=now + timedelta(seconds=settings.TASK_LEASE),
+        updated_at=now,
+    )
+    return Task.objects.get(pk=task_id) if claimed else None
+
+
+def finish(queued, **fields):
+    Task.objects.filter(pk=queued.pk).update(updated_at=timezone.now(),
+                                             **fields)
+
+
+def execute(queued):
+    """Выполняет захваченную задачу.
+
+    Возвращает задержку перед повтором в секундах или ``None``, если
+    повтора не будет.
+    """
+    function = TASKS.get(queued.name)
+    try:
+        if function is None:
+            raise LookupError(f'Задача {queued.name} не зарегистрирована.')
+        result = function(**queued.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s #%s упала', queued.name, queued.pk)
+        if function is not None and queued.attempts < queued.max_attempts:
+            delay = settings.TASK_RETRY_DELAY * 2 ** (queued.attempts - 1)
+            try:
+                with transaction.atomic():
+                    finish(queued, status=Task.PENDING, error=error,
+                           run_after=timezone.now() + timedelta(
+                               seconds=delay))
+                return delay
+            except IntegrityError:
+                error += '\nВ очереди уже есть задача с тем же ключом.'
+        finish(queued, status=Task.FAILED, error=error)
+        return None
+    finish(queued, status=Task.DONE, result=result, error='')
+    return None
+
+
+def run_ready(limit):
+    """Выполняет до ``limit`` готовых задач, возвращает их число."""
+    done = 0
+    task_ids = list(ready_tasks().order_by('run_after')
+                    .values_list('pk', flat=True)[:limit])
+    for task_id in task_ids:
+        queued = claim(task_id)
+        if queued is not None:
+            execute(queued)
+            done += 1
+    return done
+
+
+class DatabaseBroker:
+    """Задачи хранятся в БД и выполняются командой ``run_tasks``."""
+
+    def submit(self, task_id):
+        pass
+
+
+class ThreadBroker:
+    """Задачи выполняются пулом потоков того же процесса.
+
+    Запись в БД всё равно создаётся: по ней отдаётся статус, и её
+    подберёт ``run_tasks``, если процесс завершится раньше.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    settings.TASK_THREADS, thread_name_prefix='tasks')
+            return self._executor
+
+    def submit(self, task_id):
+        transaction.on_commit(lambda: self.schedule(task_id))
+
+    def schedule(self, task_id, delay=0):
+        if delay:
+            timer = threading.Timer(delay, self.schedule, (task_id,))
+            timer.daemon = True
+            timer.start()
+            return
+        self.executor.submit(self.run, task_id)
+
+    def run(self, task_id):
+        try:
+            queued = claim(task_id)
+            if queued is not None:
+                delay = execute(queued)
+                if delay is not None:
+                    self.schedule(task_id, delay)
+        except Exception:
+            logger.exception('Не удалось выполнить задачу #%s', task_id)
+        finally:
+            connection.close()
+
+
+BROKERS = {
+    'database': DatabaseBroker,
+    'thread': ThreadBroker,
+}
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = BROKERS[settings.TASK_BROKER]()
+    return _broker
@@ -1,22 +1,27 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.admin_filters import AuthorFilter, UserFilter
+
 from . import models
 
 
 @admin.register(models.User)
 class UserAdmin(UserAdmin):
     list_display = (
-        'username', 'pk', 'email', 'password', 'first_name', 'last_name',
+        'username', 'pk', 'email', 'first_name', 'last_name',
     )
-    list_editable = ('password', )
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_active')
     search_fields = ('username', 'email')
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
 @admin.register(models.Subscribe)
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
-    list_editable = ('user', 'author')
+    list_filter = (UserFilter, AuthorFilter)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    show_full_result_count = False
     empty_value_display = '-пусто-'